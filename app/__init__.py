@@ -1,26 +1,42 @@
-from flask import Flask
+from flask import Flask, request
 from flask_pymongo import PyMongo
 from flask_login import LoginManager
 from .config import Config
+from .passwords import PasswordHasherBusy
 
 mongo = PyMongo()
 login_manager = LoginManager()
 
+def init_mongo(app):
+    # The client connects lazily, on the first command
+    mongo.init_app(
+        app,
+        maxPoolSize=app.config['MONGO_MAX_POOL_SIZE'],
+        minPoolSize=app.config['MONGO_MIN_POOL_SIZE'],
+        waitQueueTimeoutMS=app.config['MONGO_WAIT_QUEUE_TIMEOUT_MS'],
+        serverSelectionTimeoutMS=app.config['MONGO_SERVER_SELECTION_TIMEOUT_MS'],
+        connectTimeoutMS=app.config['MONGO_CONNECT_TIMEOUT_MS'],
+        socketTimeoutMS=app.config['MONGO_SOCKET_TIMEOUT_MS']
+    )
+
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
     
-    mongo.init_app(app)
+    from . import metrics
+    metrics.register_listeners()
+    init_mongo(app)
+    metrics.init_app(app)
+    from .models.book import Book
+    Book.init_cache(app)
+    
+    # No database round trip here: the heartbeat in app.health connects,
+    # creates indexes and reports readiness once the first request arrives
+    from . import health
+    health.init_app(app)
     
-    # Test MongoDB connection (non-blocking)
-    with app.app_context():
-        try:
-            mongo.db.command('ping')
-            print(f"✓ Connected to MongoDB: {app.config['MONGO_URI']}")
-        except Exception as e:
-            print(f"⚠ MongoDB connection failed (will retry): {e}")
-            print(f"MongoDB URI: {app.config['MONGO_URI']}")
-            # Don't fail, let the app start and retry connections later
+    from . import ratelimit
+    ratelimit.init_app(app)
     
     # Initialize Flask-Login
     login_manager.init_app(app)
@@ -31,16 +47,36 @@ def create_app():
     @login_manager.user_loader
     def load_user(user_id):
         from .models.user import User
-        return User.get_by_id(user_id)
-    
-    # Health check route
-    @app.route('/health')
-    def health_check():
-        try:
-            mongo.db.command('ping')
-            return {'status': 'healthy', 'database': 'connected'}, 200
-        except Exception as e:
-            return {'status': 'unhealthy', 'database': 'disconnected', 'error': str(e)}, 500
+        return User.get_cached(user_id)
+    
+    @app.errorhandler(PasswordHasherBusy)
+    def password_hasher_busy(e):
+        return {'error': 'Server busy, please retry shortly'}, 503, {'Retry-After': '1'}
+    
+    from .storage import is_content_addressed
+    
+    @app.after_request
+    def cache_immutable_uploads(response):
+        # Content-addressed uploads are named by their digest and never change
+        if (response.status_code in (200, 304) and request.path.startswith('/static/uploads/')
+                and is_content_addressed(request.path)):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = 31536000
+            response.cache_control.immutable = True
+        return response
+    
+    from . import assets
+    assets.init_app(app)
+    
+    from .images import images_cli, cover_srcset
+    app.cli.add_command(images_cli)
+    
+    from .cli import books_cli, favorites_cli, recommendations_cli
+    app.cli.add_command(books_cli)
+    app.cli.add_command(favorites_cli)
+    app.cli.add_command(recommendations_cli)
+    app.add_template_global(cover_srcset)
     
     # Register blueprints
     from .routes import books, auth, admin, client, favorites
@@ -0,0 +1,115 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import click
+from flask import current_app, request, send_from_directory
+from flask.cli import AppGroup
+
+try:
+    import brotli
+except ImportError:  # only gzip variants are built
+    brotli = None
+
+DIST_DIR = 'dist'
+MANIFEST = 'manifest.json'
+FINGERPRINT_EXTENSIONS = ('.css', '.js', '.svg', '.woff', '.woff2')
+COMPRESS_EXTENSIONS = ('.css', '.js', '.svg')
+# Preferred first when the client accepts both
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+ONE_YEAR = 365 * 24 * 3600
+
+assets_cli = AppGroup('assets', help='Static asset pipeline.')
+
+
+def build(static_folder):
+    """Copy static assets to ``dist/`` under content-hashed names and precompress them.
+
+    Writes ``dist/manifest.json`` mapping each source path (as passed to
+    ``url_for('static', filename=...)``) to its fingerprinted path.
+    """
+    dist = os.path.join(static_folder, DIST_DIR)
+    manifest = {}
+    for root, dirs, files in os.walk(static_folder):
+        rel_root = os.path.relpath(root, static_folder)
+        if rel_root.split(os.sep)[0] in (DIST_DIR, 'uploads'):
+            dirs[:] = []
+            continue
+        for name in files:
+            if not name.endswith(FINGERPRINT_EXTENSIONS):
+                continue
+            source = os.path.normpath(os.path.join(rel_root, name)).replace(os.sep, '/')
+            with open(os.path.join(static_folder, source), 'rb') as f:
+                content = f.read()
+            stem, ext = os.path.splitext(source)
+            target = f'{stem}.{hashlib.sha256(content).hexdigest()[:12]}{ext}'
+            target_path = os.path.join(dist, target)
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            with open(target_path, 'wb') as f:
+                f.write(content)
+            if ext in COMPRESS_EXTENSIONS:
+                with open(target_path + '.gz', 'wb') as f:
+                    f.write(gzip.compress(content, compresslevel=9, mtime=0))
+                if brotli is not None:
+                    with open(target_path + '.br', 'wb') as f:
+                        f.write(brotli.compress(content, quality=11))
+            manifest[source] = f'{DIST_DIR}/{target}'
+
+    with open(os.path.join(dist, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def init_app(app):
+    """Rewrite static URLs through the build manifest and serve fingerprinted files with far-future caching.
+
+    Without a manifest (e.g. in development) static files are served as-is.
+    """
+    manifest_path = os.path.join(app.static_folder, DIST_DIR, MANIFEST)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    fingerprinted = set(manifest.values())
+    app.extensions['asset_manifest'] = manifest
+
+    @app.url_defaults
+    def fingerprint_static_urls(endpoint, values):
+        if endpoint == 'static' and values.get('filename') in manifest:
+            values['filename'] = manifest[values['filename']]
+
+    default_static = app.view_functions['static']
+
+    def static(filename):
+        if filename not in fingerprinted:
+            return default_static(filename=filename)
+        mimetype = mimetypes.guess_type(filename)[0]
+        for encoding, suffix in ENCODINGS:
+            if request.accept_encodings.quality(encoding) > 0 and os.path.exists(
+                    os.path.join(app.static_folder, filename + suffix)):
+                response = send_from_directory(app.static_folder, filename + suffix,
+                                               mimetype=mimetype, max_age=ONE_YEAR)
+                response.headers['Content-Encoding'] = encoding
+                break
+        else:
+            response = send_from_directory(app.static_folder, filename, mimetype=mimetype, max_age=ONE_YEAR)
+        response.vary.add('Accept-Encoding')
+        response.cache_control.immutable = True
+        return response
+
+    app.view_functions['static'] = static
+    app.cli.add_command(assets_cli)
+
+
+@assets_cli.command('build')
+def build_command():
+    """Fingerprint and precompress static assets."""
+    manifest = build(current_app.static_folder)
+    click.echo(f"✓ Built {len(manifest)} asset(s) into {os.path.join(current_app.static_folder, DIST_DIR)}")
+
+
+if __name__ == '__main__':
+    # Used by the Docker build, where no database is available
+    static_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+    print(f"✓ Built {len(build(static_folder))} asset(s)")
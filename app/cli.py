@@ -0,0 +1,159 @@
+import csv
+import json
+import os
+import time
+import click
+from flask.cli import AppGroup
+from app.models.book import Book
+from app.models.favorite import Favorite
+from app.models.recommendation import Recommendation
+
+favorites_cli = AppGroup('favorites', help='Favorites maintenance.')
+recommendations_cli = AppGroup('recommendations', help='"Readers also liked" lists.')
+books_cli = AppGroup('books', help='Bulk catalog import and export.')
+
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.json': 'jsonl'}
+
+
+@favorites_cli.command('migrate')
+@click.option('--batch-size', default=1000, show_default=True)
+def migrate_favorites(batch_size):
+    """Move favorites embedded in user documents into the favorites collection."""
+    Favorite.ensure_indexes()
+    users, favorites = Favorite.migrate_embedded(batch_size=batch_size)
+    click.echo(f"✓ Migrated {favorites} favorite(s) from {users} user(s)")
+    updated = Favorite.recount(batch_size=batch_size)
+    click.echo(f"✓ Recounted favorites for {updated} book(s)")
+
+
+@favorites_cli.command('recount')
+@click.option('--batch-size', default=1000, show_default=True)
+def recount_favorites(batch_size):
+    """Recompute every book's favorite_count from the favorites collection."""
+    updated = Favorite.recount(batch_size=batch_size)
+    click.echo(f"✓ Recounted favorites for {updated} book(s)")
+
+
+@recommendations_cli.command('rebuild')
+@click.option('--batch-size', default=1000, show_default=True)
+def rebuild_recommendations(batch_size):
+    """Recompute the co-occurrence matrix and every book's similar-books list."""
+    Recommendation.ensure_indexes()
+    pairs, books = Recommendation.rebuild(batch_size=batch_size)
+    click.echo(f"✓ Wrote {pairs} book pair(s) and {books} recommendation list(s)")
+
+
+def _format_for(stream, fmt):
+    if fmt:
+        return fmt
+    fmt = FORMATS.get(os.path.splitext(getattr(stream, 'name', ''))[1].lower())
+    if fmt is None:
+        raise click.UsageError('Cannot tell the format from the file name; pass --format.')
+    return fmt
+
+
+def _read_rows(source, fmt):
+    """Yield ``(line number, row dict or None, error)`` without loading the file."""
+    if fmt == 'csv':
+        reader = csv.DictReader(source)
+        for row in reader:
+            yield reader.line_num, row, None
+        return
+    for line_no, line in enumerate(source, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_no, None, f'invalid JSON: {e}'
+            continue
+        if not isinstance(row, dict):
+            yield line_no, None, 'expected a JSON object'
+            continue
+        yield line_no, row, None
+
+
+@books_cli.command('import')
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Default: from the file extension.')
+@click.option('--batch-size', default=1000, show_default=True)
+@click.option('--upsert', 'upsert_on', metavar='FIELDS',
+              help="Update books matching these comma-separated fields instead of inserting, e.g. 'id' or 'title,author'.")
+@click.option('--max-errors', default=100, show_default=True, help='Stop after this many bad rows (0: never stop).')
+def import_books(source, fmt, batch_size, upsert_on, max_errors):
+    """Load books from a CSV or JSON Lines file (use - for stdin).
+
+    Columns: title, author, genre, year, description and optionally id.
+    """
+    fmt = _format_for(source, fmt)
+    upsert_on = ['_id' if field.strip() == 'id' else field.strip()
+                 for field in upsert_on.split(',')] if upsert_on else None
+
+    started = time.monotonic()
+    rows = written = failed = 0
+    batch, lines = [], []
+
+    def report(line_no, message):
+        nonlocal failed
+        failed += 1
+        click.echo(f"  line {line_no}: {message}", err=True)
+        if max_errors and failed >= max_errors:
+            raise click.ClickException(f'Stopped after {failed} bad rows; {written} book(s) were written')
+
+    def flush():
+        nonlocal written
+        done, errors = Book.bulk_import(batch, upsert_on=upsert_on)
+        written += done
+        for index, message in errors:
+            report(lines[index], message)
+        batch.clear()
+        lines.clear()
+        rate = rows / max(time.monotonic() - started, 1e-9)
+        click.echo(f"  {rows:,} rows read, {written:,} written, {failed:,} failed ({rate:,.0f} rows/s)", err=True)
+
+    try:
+        for line_no, row, error in _read_rows(source, fmt):
+            rows += 1
+            if error is None:
+                try:
+                    batch.append(Book.from_import(row))
+                    lines.append(line_no)
+                except ValueError as e:
+                    error = str(e)
+            if error is not None:
+                report(line_no, error)
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    finally:
+        if written:
+            Book.bulk_import_finished()
+    click.echo(f"✓ Imported {written:,} of {rows:,} row(s) in {time.monotonic() - started:.1f}s, {failed:,} failed")
+
+
+@books_cli.command('export')
+@click.argument('target', type=click.File('w', encoding='utf-8'), default='-')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']),
+              help='Default: from the file extension, or jsonl for stdout.')
+@click.option('--batch-size', default=1000, show_default=True, help='Documents fetched per cursor batch.')
+def export_books(target, fmt, batch_size):
+    """Stream the catalog to a CSV or JSON Lines file (default: stdout)."""
+    fmt = fmt or ('jsonl' if target.name == '<stdout>' else _format_for(target, None))
+    fields = ('id',) + Book.IMPORT_FIELDS
+    writer = csv.DictWriter(target, fieldnames=fields) if fmt == 'csv' else None
+    if writer:
+        writer.writeheader()
+
+    started = time.monotonic()
+    count = 0
+    for row in Book.iter_export(batch_size=batch_size):
+        if writer:
+            writer.writerow(row)
+        else:
+            target.write(json.dumps(row, ensure_ascii=False) + '\n')
+        count += 1
+        if count % (batch_size * 50) == 0:
+            click.echo(f"  {count:,} books exported", err=True)
+    target.flush()
+    click.echo(f"✓ Exported {count:,} book(s) in {time.monotonic() - started:.1f}s", err=True)
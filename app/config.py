@@ -6,5 +6,60 @@ load_dotenv()
 class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'default-secret-key')
     MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/book_library')
+    # Per worker process; gunicorn threads share one pool
+    MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', 50))
+    MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', 0))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', 5000))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000))
+    MONGO_CONNECT_TIMEOUT_MS = int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', 5000))
+    MONGO_SOCKET_TIMEOUT_MS = int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', 30000))
+    MONGO_HEARTBEAT_INTERVAL = float(os.getenv('MONGO_HEARTBEAT_INTERVAL', 5))  # seconds, readiness ping
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'uploads')
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
\ No newline at end of file
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+    BOOKS_PER_PAGE = int(os.getenv('BOOKS_PER_PAGE', 24))
+    USERS_PER_PAGE = int(os.getenv('USERS_PER_PAGE', 50))
+    SEARCH_RESULT_LIMIT = int(os.getenv('SEARCH_RESULT_LIMIT', 50))
+    SUGGEST_LIMIT = int(os.getenv('SUGGEST_LIMIT', 8))
+    SUGGEST_REBUILD_INTERVAL = int(os.getenv('SUGGEST_REBUILD_INTERVAL', 300))  # seconds
+    STATS_RECOMPUTE_INTERVAL = int(os.getenv('STATS_RECOMPUTE_INTERVAL', 600))  # seconds
+    FACET_CACHE_TTL = int(os.getenv('FACET_CACHE_TTL', 60))  # seconds
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 300))  # seconds
+    USER_CACHE_VERIFY_INTERVAL = float(os.getenv('USER_CACHE_VERIFY_INTERVAL', 5))  # seconds
+    BOOK_CACHE_SIZE = int(os.getenv('BOOK_CACHE_SIZE', 2048))  # entries per worker
+    BOOK_CACHE_TTL = int(os.getenv('BOOK_CACHE_TTL', 60))  # seconds
+    BOOK_CACHE_VERIFY_INTERVAL = float(os.getenv('BOOK_CACHE_VERIFY_INTERVAL', 2))  # seconds
+    # Full Werkzeug method string as stored in the hash, e.g. 'pbkdf2:sha256:600000' or 'scrypt:32768:8:1'.
+    # Hashes made with anything else are upgraded on the user's next successful login.
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))  # 0 hashes on the request thread
+    PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv('PASSWORD_HASH_QUEUE_LIMIT', 16))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 10))  # seconds
+    IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+    PAGE_CACHE_TTL = int(os.getenv('PAGE_CACHE_TTL', 300))  # seconds
+    SLOW_REQUEST_DB_CALLS = int(os.getenv('SLOW_REQUEST_DB_CALLS', 20))
+    SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', 500))
+    RECOMMENDATION_TOP_K = int(os.getenv('RECOMMENDATION_TOP_K', 12))
+    RECOMMENDATION_BASKET_LIMIT = int(os.getenv('RECOMMENDATION_BASKET_LIMIT', 200))
+    RECOMMENDATIONS_SHOWN = int(os.getenv('RECOMMENDATIONS_SHOWN', 6))
+    VIEW_FLUSH_INTERVAL = float(os.getenv('VIEW_FLUSH_INTERVAL', 5))  # seconds
+    VIEW_BUFFER_LIMIT = int(os.getenv('VIEW_BUFFER_LIMIT', 10000))  # distinct books before an early flush
+    TRENDING_HALF_LIFE_HOURS = float(os.getenv('TRENDING_HALF_LIFE_HOURS', 24))
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory')  # 'memory' (per worker) or 'mongo' (shared)
+    RATE_LIMIT_MAX_KEYS = int(os.getenv('RATE_LIMIT_MAX_KEYS', 100000))  # memory backend buckets per worker
+    # Comma-separated "[METHOD ]endpoint-or-blueprint[?arg]=value" rules, see app/ratelimit.py
+    RATE_LIMITS = os.getenv('RATE_LIMITS', ','.join([
+        'POST auth.login=10/60',
+        'POST auth.register=5/300',
+        'POST books.search_books=30/60',
+        'books.book_list?search=30/60',
+        'client.browse_books?search=30/60',
+        'books.suggest=120/60',
+        'admin.api_stats=20/60'
+    ]))  # requests/seconds per client
+    CONCURRENCY_LIMITS = os.getenv('CONCURRENCY_LIMITS', ','.join([
+        'POST books.search_books=4',
+        'books.book_list?search=4',
+        'client.browse_books?search=4',
+        'admin.api_stats=1'
+    ]))  # requests in flight per worker
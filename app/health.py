@@ -0,0 +1,123 @@
+import os
+import threading
+import time
+from app import mongo
+
+_lock = threading.Lock()
+_state = {
+    'pid': None,
+    'ok': False,
+    'prepared': False,
+    'error': 'no heartbeat yet',
+    'checked_at': None,
+    'last_ok_at': None,
+    'latency_ms': None
+}
+
+
+def init_app(app):
+    """Liveness and readiness probes backed by a per-worker MongoDB heartbeat.
+
+    ``create_app`` never talks to the database. The first request a process
+    serves starts a daemon thread that pings MongoDB every
+    ``MONGO_HEARTBEAT_INTERVAL`` seconds and, after the first successful
+    ping, creates the indexes and builds the suggest index. Probes only read
+    the last result, so they are cheap and never wait on the database.
+    Starting on the first request (not in ``create_app``) keeps the thread
+    out of the preloaded gunicorn master, whose threads do not survive fork.
+    """
+    @app.before_request
+    def start_heartbeat():
+        if _state['pid'] != os.getpid():
+            _start(app)
+
+    @app.route('/livez')
+    def livez():
+        return {'status': 'alive'}, 200
+
+    @app.route('/readyz')
+    def readyz():
+        ready, body = _status(app)
+        return body, 200 if ready else 503
+
+    # Kept for existing probes and scripts; same answer as /readyz
+    @app.route('/health')
+    def health_check():
+        ready, body = _status(app)
+        body['status'] = 'healthy' if ready else 'unhealthy'
+        return body, 200 if ready else 503
+
+
+def _start(app):
+    with _lock:
+        if _state['pid'] == os.getpid():
+            return
+        _state.update(pid=os.getpid(), ok=False, prepared=False, error='no heartbeat yet',
+                      checked_at=None, last_ok_at=None, latency_ms=None)
+        threading.Thread(target=_run, args=(app,), name='mongo-heartbeat', daemon=True).start()
+
+
+def _run(app):
+    interval = app.config['MONGO_HEARTBEAT_INTERVAL']
+    while True:
+        with app.app_context():
+            if _ping() and not _state['prepared']:
+                _prepare()
+        time.sleep(interval)
+
+
+def _ping():
+    started = time.monotonic()
+    try:
+        mongo.db.command('ping')
+    except Exception as e:
+        if _state['ok'] or _state['checked_at'] is None:
+            print(f"⚠ MongoDB unreachable: {e}")
+        _state.update(ok=False, error=str(e), checked_at=time.monotonic())
+        return False
+    now = time.monotonic()
+    if not _state['ok']:
+        print(f"✓ Connected to MongoDB (pid {os.getpid()})")
+    _state.update(ok=True, error=None, checked_at=now, last_ok_at=now,
+                  latency_ms=round((now - started) * 1000, 1))
+    return True
+
+
+def _prepare():
+    from .models.book import Book
+    from .models.user import User
+    from .models.favorite import Favorite
+    from .models.recommendation import Recommendation
+    try:
+        Book.ensure_indexes()
+        User.ensure_indexes()
+        Favorite.ensure_indexes()
+        Recommendation.ensure_indexes()
+        if mongo.db.users.find_one({'favorites': {'$exists': True}}, {'_id': 1}):
+            print("⚠ Some users still have embedded favorites; run 'flask favorites migrate'")
+    except Exception as e:
+        print(f"⚠ Could not create indexes (will retry): {e}")
+        return
+    _state['prepared'] = True
+    try:
+        Book.rebuild_suggest_index()
+    except Exception as e:
+        # /books/suggest builds it on first use instead
+        print(f"⚠ Could not build the suggest index: {e}")
+
+
+def _status(app):
+    max_age = 3 * app.config['MONGO_HEARTBEAT_INTERVAL']
+    fresh = _state['last_ok_at'] is not None and time.monotonic() - _state['last_ok_at'] <= max_age
+    ready = _state['ok'] and _state['prepared'] and fresh
+    body = {
+        'status': 'ready' if ready else 'not ready',
+        'database': 'connected' if _state['ok'] else 'disconnected',
+        'indexes': 'ready' if _state['prepared'] else 'pending',
+        'ping_ms': _state['latency_ms']
+    }
+    if _state['checked_at'] is not None:
+        body['checked_ago_s'] = round(time.monotonic() - _state['checked_at'], 1)
+    if _state['error']:
+        body['error'] = _state['error']
+    return ready, body
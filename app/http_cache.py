@@ -0,0 +1,79 @@
+import hashlib
+import time
+from datetime import timezone
+from functools import wraps
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+from app.cache import TTLCache
+
+# Distinguishes renders from different deployments of the templates
+BOOT_ID = str(time.time_ns())
+
+_page_cache = TTLCache(maxsize=512, name='pages')
+
+
+def conditional_page(get_version):
+    """Answer unchanged pages with ``304`` before the view runs.
+
+    ``get_version(**view_args)`` returns ``(version, last_modified)`` for the
+    data the page shows, or ``(None, None)`` to skip caching (e.g. the
+    book does not exist). The strong ETag also covers the URL and the
+    current user (id and version), since the navigation, admin buttons and
+    favorite hearts differ per user. Rendered pages for anonymous visitors
+    are kept in a bounded in-process cache keyed by URL and query string.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Pending flash messages are rendered once and must not be cached
+            if request.method != 'GET' or session.get('_flashes'):
+                return view(*args, **kwargs)
+            version, last_modified = get_version(**kwargs)
+            if version is None:
+                return view(*args, **kwargs)
+
+            anonymous = not current_user.is_authenticated
+            user_key = 'anon' if anonymous else f'{current_user.id}:{current_user.version}'
+            etag = hashlib.sha1(
+                f'{BOOT_ID}|{version}|{request.full_path}|{user_key}'.encode()
+            ).hexdigest()
+            if last_modified is not None:
+                last_modified = last_modified.replace(tzinfo=timezone.utc, microsecond=0)
+
+            if etag in request.if_none_match or (
+                    anonymous and not request.if_none_match and last_modified is not None
+                    and request.if_modified_since and request.if_modified_since >= last_modified):
+                return _finish(make_response('', 304), etag, last_modified, anonymous)
+
+            cached = _page_cache.get(request.full_path) if anonymous else None
+            if cached is not None and cached[0] == etag:
+                response = make_response(cached[1])
+                response.mimetype = cached[2]
+            else:
+                response = make_response(view(*args, **kwargs))
+                if anonymous and response.status_code == 200 and not response.direct_passthrough:
+                    _page_cache.set(
+                        request.full_path,
+                        (etag, response.get_data(), response.mimetype),
+                        ttl=current_app.config['PAGE_CACHE_TTL']
+                    )
+            if response.status_code != 200:
+                return response
+            return _finish(response, etag, last_modified, anonymous)
+        return wrapper
+    return decorator
+
+
+def _finish(response, etag, last_modified, anonymous):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    if not anonymous:
+        response.cache_control.private = True
+    response.vary.add('Cookie')
+    return response
+
+
+def page_cache_stats():
+    return _page_cache.stats()
@@ -0,0 +1,162 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import click
+from flask import current_app, url_for
+from flask.cli import AppGroup
+from werkzeug.datastructures import FileStorage
+from app.storage import store_upload, release_upload, is_content_addressed
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # variants are skipped and the original upload is served
+    Image = None
+
+# Variant name -> target width in pixels
+VARIANT_WIDTHS = {'thumb': 400, 'detail': 800}
+VARIANT_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+VARIANT_DIR = 'variants'
+
+_lock = threading.Lock()
+_executor = None
+
+images_cli = AppGroup('images', help='Cover image maintenance.')
+
+
+def generate_variants(upload_folder, filename, force=False):
+    """Write resized WebP/JPEG copies of an uploaded cover.
+
+    Returns ``{variant: {'width': w, 'webp': path, 'jpeg': path}}`` with
+    paths relative to ``upload_folder``, or None if Pillow is unavailable.
+    Content-addressed covers whose variants already exist are not
+    re-encoded unless ``force`` is set.
+    """
+    if Image is None:
+        return None
+    stem = _variant_stem(filename)
+    os.makedirs(os.path.join(upload_folder, VARIANT_DIR), exist_ok=True)
+
+    if is_content_addressed(stem) and not force:
+        existing = _existing_variants(upload_folder, stem)
+        if existing:
+            return existing
+
+    variants = {}
+    with Image.open(os.path.join(upload_folder, filename)) as original:
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ('RGB', 'RGBA'):
+            original = original.convert('RGBA')
+        for name, target in VARIANT_WIDTHS.items():
+            width = min(target, original.width)
+            height = max(1, round(original.height * width / original.width))
+            resized = original.resize((width, height), Image.LANCZOS)
+            variant = {'width': width}
+            for ext, fmt in VARIANT_FORMATS.items():
+                path = f'{VARIANT_DIR}/{stem}-{name}.{ext}'
+                image = resized.convert('RGB') if fmt == 'JPEG' else resized
+                image.save(os.path.join(upload_folder, path), fmt, quality=82, optimize=True)
+                variant[ext] = path
+            variants[name] = variant
+    return variants
+
+
+def _variant_stem(filename):
+    stem, ext = os.path.splitext(os.path.basename(filename))
+    # Content-addressed names are unique; legacy uploads such as cover.jpg
+    # and cover.png share a stem, so theirs keeps the extension
+    if is_content_addressed(stem) or not ext:
+        return stem
+    return f"{stem}-{ext[1:].lower()}"
+
+
+def _existing_variants(upload_folder, stem):
+    variants = {}
+    for name in VARIANT_WIDTHS:
+        paths = {ext: f'{VARIANT_DIR}/{stem}-{name}.{ext}' for ext in VARIANT_FORMATS}
+        if not all(os.path.exists(os.path.join(upload_folder, path)) for path in paths.values()):
+            return None
+        with Image.open(os.path.join(upload_folder, paths['jpeg'])) as image:
+            variants[name] = dict(paths, width=image.width)
+    return variants
+
+
+def process_cover(book_id, filename, upload_folder, force=False):
+    from app.models.book import Book
+    try:
+        variants = generate_variants(upload_folder, filename, force=force)
+    except Exception as e:
+        print(f"⚠ Could not create variants for {filename}: {e}")
+        return None
+    if variants:
+        Book.set_image_variants(book_id, filename, variants)
+    return variants
+
+
+def process_cover_async(book_id, filename):
+    """Queue variant generation so the upload request can return right away."""
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=current_app.config['IMAGE_WORKERS'],
+                    thread_name_prefix='cover-images'
+                )
+    return _executor.submit(process_cover, str(book_id), filename, current_app.config['UPLOAD_FOLDER'])
+
+
+def cover_srcset(book, fmt):
+    """``srcset`` value for the cover variants of a book document or summary in ``fmt`` ('webp' or 'jpeg')."""
+    if isinstance(book, dict):
+        variants = book.get('image_variants') or {}
+    else:
+        variants = getattr(book, 'image_variants', None) or {}
+    return ', '.join(
+        f"{url_for('static', filename='uploads/' + variant[fmt])} {variant['width']}w"
+        for variant in sorted(variants.values(), key=lambda v: v['width'])
+        if fmt in variant
+    )
+
+
+@images_cli.command('backfill')
+@click.option('--force', is_flag=True, help='Regenerate variants that already exist.')
+def backfill(force):
+    """Create cover variants for books uploaded before the image pipeline."""
+    from app.models.book import Book
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    done = failed = 0
+    for book in Book.iter_covers(missing_variants_only=not force):
+        if not os.path.exists(os.path.join(upload_folder, book['image'])):
+            click.echo(f"  missing file: {book['image']}")
+            failed += 1
+            continue
+        if process_cover(book['_id'], book['image'], upload_folder, force=force):
+            done += 1
+        else:
+            failed += 1
+    click.echo(f"✓ Processed {done} cover(s), {failed} skipped")
+
+
+@images_cli.command('migrate-storage')
+def migrate_storage():
+    """Move covers saved under their upload filename into content-addressed storage."""
+    from app.models.book import Book
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    moved = missing = 0
+    for book in Book.iter_covers(missing_variants_only=False):
+        if is_content_addressed(book['image']):
+            continue
+        source = os.path.join(upload_folder, book['image'])
+        if not os.path.exists(source):
+            click.echo(f"  missing file: {book['image']}")
+            missing += 1
+            continue
+        with open(source, 'rb') as stream:
+            path, digest = store_upload(FileStorage(stream=stream, filename=book['image']), upload_folder)
+        try:
+            Book.update(book['_id'], {'image': path, 'image_digest': digest, 'image_variants': None})
+        finally:
+            release_upload(digest, upload_folder)
+        process_cover(book['_id'], path, upload_folder)
+        moved += 1
+    click.echo(f"✓ Moved {moved} cover(s), {missing} missing; original files were left in place")
@@ -0,0 +1,237 @@
+import os
+import threading
+import time
+from flask import Response, g, request
+from pymongo import monitoring
+from app.cache import registered_caches
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_CALL_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_local = threading.local()
+_lock = threading.Lock()
+_registered = False
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, labels, value):
+        key = tuple(sorted(labels.items()))
+        with _lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self, extra):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with _lock:
+            for key, series in sorted(self._series.items()):
+                labels = dict(key, **extra)
+                for bound, count in zip(self.buckets, series['buckets']):
+                    lines.append(f'{self.name}_bucket{_labels(labels, le=_number(bound))} {count}')
+                lines.append(f'{self.name}_bucket{_labels(labels, le="+Inf")} {series["count"]}')
+                lines.append(f'{self.name}_sum{_labels(labels)} {series["sum"]}')
+                lines.append(f'{self.name}_count{_labels(labels)} {series["count"]}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+
+    def inc(self, labels, amount=1):
+        key = tuple(sorted(labels.items()))
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self, extra):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with _lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_labels(dict(key, **extra))} {value}')
+        return lines
+
+
+request_latency = Histogram(
+    'http_request_duration_seconds', 'Request latency by endpoint.', LATENCY_BUCKETS)
+request_db_calls = Histogram(
+    'http_request_db_commands', 'MongoDB commands issued per request.', DB_CALL_BUCKETS)
+request_db_time = Histogram(
+    'http_request_db_duration_seconds', 'Time spent in MongoDB per request.', LATENCY_BUCKETS)
+db_commands = Counter('mongodb_commands_total', 'MongoDB commands by command name and outcome.')
+slow_requests = Counter('http_slow_requests_total', 'Requests over the DB-call or latency budget.')
+throttled_requests = Counter('http_throttled_requests_total', 'Requests refused by rate or concurrency limits.')
+
+_pool = {'connections': 0, 'checked_out': 0, 'checkout_failures': 0}
+
+
+class CommandTimer(monitoring.CommandListener):
+    """Attributes every MongoDB command to the request running on the current thread."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event, 'ok')
+
+    def failed(self, event):
+        self._record(event, 'error')
+
+    def _record(self, event, outcome):
+        db_commands.inc({'command': event.command_name, 'outcome': outcome})
+        stats = getattr(_local, 'stats', None)
+        if stats is None:
+            return
+        duration = event.duration_micros / 1e6
+        stats['count'] += 1
+        stats['time'] += duration
+        if duration > stats['slowest'][1]:
+            stats['slowest'] = (event.command_name, duration)
+
+
+class PoolTracker(monitoring.ConnectionPoolListener):
+    def _add(self, key, amount):
+        with _lock:
+            _pool[key] += amount
+
+    def connection_created(self, event):
+        self._add('connections', 1)
+
+    def connection_closed(self, event):
+        self._add('connections', -1)
+
+    def connection_checked_out(self, event):
+        self._add('checked_out', 1)
+
+    def connection_checked_in(self, event):
+        self._add('checked_out', -1)
+
+    def connection_check_out_failed(self, event):
+        self._add('checkout_failures', 1)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+
+def register_listeners():
+    """Must run before the MongoClient is created; listeners are global to pymongo."""
+    global _registered
+    if not _registered:
+        monitoring.register(CommandTimer())
+        monitoring.register(PoolTracker())
+        _registered = True
+
+
+def init_app(app):
+    @app.before_request
+    def start_request_metrics():
+        g.request_started = time.perf_counter()
+        _local.stats = {'count': 0, 'time': 0.0, 'slowest': (None, 0.0)}
+
+    @app.after_request
+    def record_request_metrics(response):
+        stats = getattr(_local, 'stats', None)
+        started = g.get('request_started')
+        if stats is None or started is None or request.endpoint == 'metrics':
+            return response
+        elapsed = time.perf_counter() - started
+        endpoint = request.endpoint or 'unmatched'
+        labels = {'endpoint': endpoint, 'method': request.method}
+        request_latency.observe(dict(labels, status=str(response.status_code)), elapsed)
+        request_db_calls.observe(labels, stats['count'])
+        request_db_time.observe(labels, stats['time'])
+        response.headers['Server-Timing'] = (
+            f'db;dur={stats["time"] * 1000:.1f};desc="{stats["count"]} commands", '
+            f'total;dur={elapsed * 1000:.1f}'
+        )
+
+        config = app.config
+        if stats['count'] > config['SLOW_REQUEST_DB_CALLS'] or elapsed * 1000 > config['SLOW_REQUEST_MS']:
+            slow_requests.inc({'endpoint': endpoint})
+            command, slowest = stats['slowest']
+            app.logger.warning(
+                'Slow request %s %s: %.1f ms, %d DB commands (%.1f ms), slowest %s %.1f ms',
+                request.method, request.full_path, elapsed * 1000, stats['count'],
+                stats['time'] * 1000, command, slowest * 1000
+            )
+        return response
+
+    @app.teardown_request
+    def clear_request_metrics(exc):
+        _local.stats = None
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(render(), mimetype='text/plain; version=0.0.4')
+
+
+def render():
+    """Prometheus text exposition for this worker process (labelled with its pid)."""
+    worker = {'worker': str(os.getpid())}
+    lines = []
+    for metric in (request_latency, request_db_calls, request_db_time, db_commands, slow_requests,
+                   throttled_requests):
+        lines.extend(metric.render(worker))
+
+    lines += ['# HELP mongodb_pool_connections Open connections in the MongoDB pool.',
+              '# TYPE mongodb_pool_connections gauge',
+              f'mongodb_pool_connections{_labels(worker)} {_pool["connections"]}',
+              '# HELP mongodb_pool_checked_out Connections currently checked out.',
+              '# TYPE mongodb_pool_checked_out gauge',
+              f'mongodb_pool_checked_out{_labels(worker)} {_pool["checked_out"]}',
+              '# HELP mongodb_pool_checkout_failures_total Failed connection checkouts.',
+              '# TYPE mongodb_pool_checkout_failures_total counter',
+              f'mongodb_pool_checkout_failures_total{_labels(worker)} {_pool["checkout_failures"]}']
+
+    caches = sorted(registered_caches().items())
+    for name, kind, key in (('cache_hits_total', 'counter', 'hits'),
+                            ('cache_misses_total', 'counter', 'misses'),
+                            ('cache_entries', 'gauge', 'size'),
+                            ('cache_hit_ratio', 'gauge', 'hit_rate')):
+        lines += [f'# HELP {name} In-process cache {key.replace("_", " ")}.', f'# TYPE {name} {kind}']
+        for cache_name, cache in caches:
+            lines.append(f'{name}{_labels(dict(worker, cache=cache_name))} {cache.stats()[key]}')
+    return '\n'.join(lines) + '\n'
+
+
+def _labels(labels, **extra):
+    labels = dict(labels, **extra)
+    if not labels:
+        return ''
+    pairs = (f'{k}="{_escape(v)}"' for k, v in sorted(labels.items()))
+    return '{' + ','.join(pairs) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if not float(value).is_integer() else f'{float(value):.1f}'
@@ -1,32 +1,553 @@
+import threading
+import time
 from app import mongo
 from bson.objectid import ObjectId
+from datetime import datetime
+from pymongo import ASCENDING, DESCENDING, TEXT, InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+from flask import current_app
+from app.cache import TTLCache
+from app.suggest import suggest_index
+from app.models.stats import Stats
+from app.models.upload import Upload
+from app.models.favorite import Favorite
+from app.models.recommendation import Recommendation
+from app.models.pagination import keyset_page, parse_cursor
+from app.storage import release_upload
+
+_facet_cache = TTLCache(maxsize=256, name='facets')
+_book_cache = TTLCache(maxsize=2048, name='books')
+# Catalog version the cached books belong to, and when it was last read
+_book_cache_state = {'version': None, 'checked_at': 0.0, 'resets': 0}
+_book_cache_lock = threading.Lock()
+
+# Characters of the description kept for list views (cards show up to 100)
+DESCRIPTION_SNIPPET = 120
+
+
+class BookSummary:
+    """Compact, read-only book record for list views.
+
+    ``description`` holds only the first ``DESCRIPTION_SNIPPET`` characters;
+    load the full document with ``Book.get_by_id``.
+    """
+    __slots__ = ('_id', 'title', 'author', 'genre', 'year', 'description', 'image', 'image_variants',
+                 'favorite_count')
+
+    def __init__(self, doc):
+        self._id = doc['_id']
+        self.title = doc.get('title')
+        self.author = doc.get('author')
+        self.genre = doc.get('genre')
+        self.year = doc.get('year')
+        # Already trimmed by SUMMARY_PROJECTION; trimming again covers plain projections
+        self.description = (doc.get('description') or '')[:DESCRIPTION_SNIPPET]
+        self.image = doc.get('image')
+        self.image_variants = doc.get('image_variants')
+        self.favorite_count = doc.get('favorite_count', 0)
+
+    @property
+    def id(self):
+        return str(self._id)
+
+    def __repr__(self):
+        return f'<BookSummary {self._id} {self.title!r}>'
+
 
 class Book:
+    TEXT_INDEX_WEIGHTS = {'title': 10, 'author': 5, 'genre': 2, 'description': 1}
+    # Catalog fields read by `flask books import` and written by `export`; covers are not included
+    IMPORT_FIELDS = ('title', 'author', 'genre', 'year', 'description')
+    # Trims the description on the server, so list pages never transfer it in full
+    SUMMARY_PROJECTION = {
+        'title': 1, 'author': 1, 'genre': 1, 'year': 1, 'image': 1, 'image_variants': 1, 'favorite_count': 1,
+        'description': {'$substrCP': ['$description', 0, DESCRIPTION_SNIPPET]}
+    }
+
+    @staticmethod
+    def ensure_indexes():
+        mongo.db.books.create_index(
+            [(field, TEXT) for field in Book.TEXT_INDEX_WEIGHTS],
+            weights=Book.TEXT_INDEX_WEIGHTS,
+            name='books_text'
+        )
+        # Equality filters followed by the keyset sort used by Book.paginate
+        mongo.db.books.create_index([('genre', ASCENDING), ('_id', DESCENDING)])
+        mongo.db.books.create_index([('author', ASCENDING), ('_id', DESCENDING)])
+        mongo.db.books.create_index([('year', ASCENDING), ('_id', DESCENDING)])
+        # "Most favorited" sort
+        mongo.db.books.create_index([('favorite_count', DESCENDING), ('_id', DESCENDING)])
+        # "Trending" sort, see BookViews
+        mongo.db.books.create_index([('trending', DESCENDING), ('_id', DESCENDING)])
+
+    @staticmethod
+    def load_suggest_entries():
+        return mongo.db.books.find({}, {'title': 1, 'author': 1})
+
+    @staticmethod
+    def rebuild_suggest_index():
+        suggest_index.build(Book.load_suggest_entries())
+
     @staticmethod
     def get_all():
         return list(mongo.db.books.find())
-    
+
+    @staticmethod
+    def paginate(filters=None, after=None, before=None, per_page=None, with_total=False):
+        """Keyset pagination over ``_id``, newest books first, as ``BookSummary`` records.
+
+        See ``keyset_page`` for the cursors.
+        """
+        page = keyset_page(
+            mongo.db.books, filters, Book.SUMMARY_PROJECTION, after=after, before=before,
+            per_page=per_page or current_app.config['BOOKS_PER_PAGE'], record=BookSummary
+        )
+        if with_total:
+            page['total'] = Book.count(filters)
+        return page
+
+    @staticmethod
+    def list_page(sort=None):
+        """The paging function behind the catalog's ``sort`` parameter."""
+        return {'popular': Book.popular_page, 'trending': Book.trending_page}.get(sort, Book.paginate)
+
+    @staticmethod
+    def popular_page(filters=None, after=None, before=None, per_page=None, with_total=False):
+        """Most favorited books first, with the same shape as ``Book.paginate``.
+
+        Counts change with every favorite toggle, so like ``search_page`` the
+        cursors are result offsets.
+        """
+        return Book._ranked_page('favorite_count', filters, after, before, per_page, with_total)
+
+    @staticmethod
+    def trending_page(filters=None, after=None, before=None, per_page=None, with_total=False):
+        """Most viewed books first, recent views counting more; see ``BookViews``.
+
+        Offset cursors, like ``popular_page``.
+        """
+        return Book._ranked_page('trending', filters, after, before, per_page, with_total)
+
+    @staticmethod
+    def _ranked_page(field, filters, after, before, per_page, with_total):
+        per_page = per_page or current_app.config['BOOKS_PER_PAGE']
+        start = Book._parse_offset(after)
+        if start is None:
+            end = Book._parse_offset(before)
+            start = max(0, end - per_page) if end is not None else 0
+
+        cursor = mongo.db.books.find(dict(filters or {}), Book.SUMMARY_PROJECTION).sort(
+            [(field, DESCENDING), ('_id', DESCENDING)]
+        ).skip(start).limit(per_page + 1)
+        books = [BookSummary(doc) for doc in cursor]
+        has_next = len(books) > per_page
+        return {
+            'items': books[:per_page],
+            'per_page': per_page,
+            'next_cursor': str(start + per_page) if has_next else None,
+            'prev_cursor': str(start) if start > 0 else None,
+            'total': Book.count(filters) if with_total else None
+        }
+
+    @staticmethod
+    def count(filters=None):
+        if filters:
+            return mongo.db.books.count_documents(filters)
+        return mongo.db.books.estimated_document_count()
+
+    @staticmethod
+    def build_filters(genre=None, author=None, decade=None, year_from=None, year_to=None):
+        """Translate catalog filter arguments into a Mongo query; blank values are ignored."""
+        filters = {}
+        if genre:
+            filters['genre'] = genre
+        if author:
+            filters['author'] = author
+        decade = Book._parse_offset(decade)
+        if decade is not None:
+            year_from, year_to = decade, decade + 9
+        year_range = {}
+        if Book._parse_offset(year_from) is not None:
+            year_range['$gte'] = int(year_from)
+        if Book._parse_offset(year_to) is not None:
+            year_range['$lte'] = int(year_to)
+        if year_range:
+            filters['year'] = year_range
+        return filters
+
+    @staticmethod
+    def facets(filters=None):
+        """Genre and decade counts for the catalog in one ``$facet`` aggregation.
+
+        Each facet honours every filter except its own, so the genre list
+        still offers the other genres once one is selected. Results are cached
+        for ``FACET_CACHE_TTL`` seconds.
+        """
+        filters = dict(filters or {})
+        cache_key = repr(sorted(filters.items()))
+        cached = _facet_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        genre = filters.pop('genre', None)
+        year = filters.pop('year', None)
+        decade = {'$multiply': [{'$floor': {'$divide': ['$year', 10]}}, 10]}
+        pipeline = []
+        if filters:
+            pipeline.append({'$match': filters})
+        pipeline.append({'$facet': {
+            'genres': ([{'$match': {'year': year}}] if year else []) + [
+                {'$match': {'genre': {'$nin': [None, '']}}},
+                {'$group': {'_id': '$genre', 'count': {'$sum': 1}}},
+                {'$sort': {'_id': 1}}
+            ],
+            'decades': ([{'$match': {'genre': genre}}] if genre else []) + [
+                {'$match': {'year': {'$type': 'number'}}},
+                {'$group': {'_id': decade, 'count': {'$sum': 1}}},
+                {'$sort': {'_id': 1}}
+            ]
+        }})
+
+        result = next(mongo.db.books.aggregate(pipeline), {'genres': [], 'decades': []})
+        facets = {
+            'genres': [{'value': row['_id'], 'count': row['count']} for row in result['genres']],
+            'decades': [{'value': int(row['_id']), 'count': row['count']} for row in result['decades']]
+        }
+        _facet_cache.set(cache_key, facets, ttl=current_app.config['FACET_CACHE_TTL'])
+        return facets
+
+    @staticmethod
+    def _parse_cursor(cursor):
+        return parse_cursor(cursor)
+
     @staticmethod
     def get_by_id(book_id):
-        return mongo.db.books.find_one({'_id': ObjectId(book_id)})
-    
+        """The full book document, or None; served from the per-worker book cache.
+
+        Returns a shallow copy, so callers may modify the top-level fields.
+        """
+        book_id = Book._parse_cursor(book_id)
+        if book_id is None:
+            return None
+        Book._verify_cache()
+        book = _book_cache.get(book_id)
+        if book is None:
+            book = mongo.db.books.find_one({'_id': book_id})
+            if book is None:
+                return None
+            _book_cache.set(book_id, book, ttl=current_app.config['BOOK_CACHE_TTL'])
+        return dict(book)
+
+    @staticmethod
+    def get_many(book_ids):
+        """Fetch summaries of several books, in the order of ``book_ids``.
+
+        Summaries are cached per book; the misses are loaded in one query.
+        Malformed ids and ids of deleted books are skipped.
+        """
+        object_ids = [oid for oid in map(Book._parse_cursor, book_ids) if oid is not None]
+        if not object_ids:
+            return []
+        Book._verify_cache()
+        by_id = {}
+        for oid in object_ids:
+            summary = _book_cache.get(('summary', oid))
+            if summary is not None:
+                by_id[oid] = summary
+        missing = [oid for oid in object_ids if oid not in by_id]
+        if missing:
+            ttl = current_app.config['BOOK_CACHE_TTL']
+            for book in mongo.db.books.find({'_id': {'$in': missing}}, Book.SUMMARY_PROJECTION):
+                by_id[book['_id']] = summary = BookSummary(book)
+                _book_cache.set(('summary', book['_id']), summary, ttl=ttl)
+        return [by_id[oid] for oid in object_ids if oid in by_id]
+
+    @staticmethod
+    def init_cache(app):
+        _book_cache.maxsize = app.config['BOOK_CACHE_SIZE']
+
+    @staticmethod
+    def _verify_cache():
+        """Drop the book cache when another worker has written to the catalog.
+
+        Every book write bumps the ``books`` counter. It is read at most
+        once per ``BOOK_CACHE_VERIFY_INTERVAL`` seconds per worker, so
+        edits made elsewhere show up within that interval. Favorite counts
+        bump only the book's own ``version`` and may lag by up to
+        ``BOOK_CACHE_TTL`` in other workers.
+        """
+        now = time.monotonic()
+        if now - _book_cache_state['checked_at'] < current_app.config['BOOK_CACHE_VERIFY_INTERVAL']:
+            return
+        version, _ = Book.collection_version()
+        with _book_cache_lock:
+            if _book_cache_state['version'] != version:
+                if _book_cache_state['version'] is not None:
+                    _book_cache_state['resets'] += 1
+                _book_cache.clear()
+                _book_cache_state['version'] = version
+            _book_cache_state['checked_at'] = now
+
+    @staticmethod
+    def invalidate_cache(book_ids=None):
+        """Evict ``book_ids`` from this worker's book cache, or everything if None."""
+        if book_ids is None:
+            _book_cache.clear()
+            return
+        for book_id in book_ids:
+            book_id = Book._parse_cursor(book_id)
+            _book_cache.pop(book_id)
+            _book_cache.pop(('summary', book_id))
+
+    @staticmethod
+    def cache_stats():
+        stats = _book_cache.stats()
+        stats['resets'] = _book_cache_state['resets']
+        return stats
+
     @staticmethod
     def create(data):
-        return mongo.db.books.insert_one(data)
-    
+        data['updated_at'] = datetime.utcnow()
+        data['version'] = 1
+        result = mongo.db.books.insert_one(data)
+        Book._touch_collection(data['updated_at'])
+        if data.get('image_digest'):
+            Upload.acquire(data['image_digest'], data['image'])
+        suggest_index.add_book(data)
+        Stats.book_added(data.get('genre'))
+        _facet_cache.clear()
+        return result
+
+    @staticmethod
+    def from_import(row):
+        """Validate one imported row into a book document; raises ValueError.
+
+        ``id`` (optional) becomes ``_id`` so exported catalogs can be
+        re-imported with ``--upsert id``.
+        """
+        doc = {}
+        for field in Book.IMPORT_FIELDS:
+            value = row.get(field)
+            if field != 'year' and value is not None:
+                # JSON may carry numbers (e.g. a title of 1984); the text index and summaries need strings
+                if isinstance(value, (dict, list)):
+                    raise ValueError(f'{field} must be text, got {value!r}')
+                value = str(value)
+            doc[field] = value.strip() if isinstance(value, str) else value
+        for field in ('title', 'author'):
+            if not doc[field]:
+                raise ValueError(f'{field} is required')
+        if doc['year'] in (None, ''):
+            doc['year'] = None
+        else:
+            try:
+                doc['year'] = int(doc['year'])
+            except (TypeError, ValueError):
+                raise ValueError(f"year must be a whole number, got {doc['year']!r}")
+        doc['description'] = doc['description'] or ''
+        if row.get('id'):
+            doc['_id'] = parse_cursor(str(row['id']).strip())
+            if doc['_id'] is None:
+                raise ValueError(f"id is not a valid ObjectId: {row['id']!r}")
+        return doc
+
+    @staticmethod
+    def bulk_import(docs, upsert_on=None):
+        """Write one batch of ``from_import`` documents with a single unordered bulk write.
+
+        Without ``upsert_on`` every document is inserted; with it, documents
+        matching on those fields are updated instead. Documents missing one
+        of those fields (e.g. new rows without an ``id``) are inserted.
+        Returns ``(written, errors)`` where errors are ``(index in docs,
+        message)``. Call ``bulk_import_finished`` once all batches are
+        written.
+        """
+        now = datetime.utcnow()
+        ops = []
+        for doc in docs:
+            key = {field: doc.get(field) for field in upsert_on or ()}
+            if key and None not in key.values():
+                fields = {k: v for k, v in doc.items() if k != '_id'}
+                ops.append(UpdateOne(
+                    key,
+                    {'$set': dict(fields, updated_at=now), '$inc': {'version': 1}},
+                    upsert=True
+                ))
+            else:
+                ops.append(InsertOne(dict(doc, updated_at=now, version=1)))
+        if not ops:
+            return 0, []
+        try:
+            result = mongo.db.books.bulk_write(ops, ordered=False)
+            details = result.bulk_api_result
+        except BulkWriteError as e:
+            details = e.details
+        errors = [(error['index'], error['errmsg']) for error in details.get('writeErrors', [])]
+        written = details.get('nInserted', 0) + details.get('nUpserted', 0) + details.get('nMatched', 0)
+        return written, errors
+
+    @staticmethod
+    def bulk_import_finished():
+        """Bring the derived state up to date after ``bulk_import``, once per import."""
+        Book._touch_collection()
+        Book.invalidate_cache()
+        Stats.recompute()
+        _facet_cache.clear()
+        Book.rebuild_suggest_index()
+
+    @staticmethod
+    def iter_export(batch_size=1000):
+        """Stream the catalog in ``_id`` order as flat rows with the ``IMPORT_FIELDS`` and ``id``."""
+        projection = {field: 1 for field in Book.IMPORT_FIELDS}
+        for doc in mongo.db.books.find({}, projection).sort('_id', ASCENDING).batch_size(batch_size):
+            row = {'id': str(doc['_id'])}
+            row.update((field, doc.get(field)) for field in Book.IMPORT_FIELDS)
+            yield row
+
     @staticmethod
     def update(book_id, data):
-        return mongo.db.books.update_one({'_id': ObjectId(book_id)}, {'$set': data})
-    
+        """Apply ``data``; returns the projected pre-update document, or None if the book is gone."""
+        now = datetime.utcnow()
+        previous = mongo.db.books.find_one_and_update(
+            {'_id': ObjectId(book_id)},
+            {'$set': dict(data, updated_at=now), '$inc': {'version': 1}},
+            projection={'genre': 1, 'image_digest': 1}
+        )
+        if previous:
+            Book._touch_collection(now)
+            Book.invalidate_cache([book_id])
+            if 'image_digest' in data and data['image_digest'] != previous.get('image_digest'):
+                if data['image_digest']:
+                    Upload.acquire(data['image_digest'], data['image'])
+                if previous.get('image_digest'):
+                    release_upload(previous['image_digest'], current_app.config['UPLOAD_FOLDER'])
+            suggest_index.update_book(book_id, data)
+            if 'title' in data or 'author' in data:
+                # Detail pages list their similar books by title and author
+                Recommendation.book_changed(book_id)
+            if 'genre' in data:
+                Stats.book_genre_changed(previous.get('genre'), data['genre'])
+            _facet_cache.clear()
+        return previous
+
     @staticmethod
     def delete(book_id):
-        return mongo.db.books.delete_one({'_id': ObjectId(book_id)})
-    
-    @staticmethod
-    def search(query):
-        return list(mongo.db.books.find({
-            '$or': [
-                {'title': {'$regex': query, '$options': 'i'}},
-                {'author': {'$regex': query, '$options': 'i'}}
-            ]
-        }))
\ No newline at end of file
+        deleted = mongo.db.books.find_one_and_delete(
+            {'_id': ObjectId(book_id)},
+            projection={'genre': 1, 'image_digest': 1}
+        )
+        if deleted:
+            Book._touch_collection()
+            Book.invalidate_cache([book_id])
+            if deleted.get('image_digest'):
+                release_upload(deleted['image_digest'], current_app.config['UPLOAD_FOLDER'])
+            suggest_index.remove_book(book_id)
+            Favorite.remove_for_book(book_id)
+            Recommendation.remove_book(book_id)
+            Stats.book_removed(deleted.get('genre'))
+            _facet_cache.clear()
+        return deleted
+
+    @staticmethod
+    def set_image_variants(book_id, image, variants):
+        # Only attach variants if the cover was not replaced in the meantime
+        now = datetime.utcnow()
+        result = mongo.db.books.update_one(
+            {'_id': ObjectId(book_id), 'image': image},
+            {'$set': {'image_variants': variants, 'updated_at': now}, '$inc': {'version': 1}}
+        )
+        if result.modified_count:
+            Book._touch_collection(now)
+            Book.invalidate_cache([book_id])
+        return result
+
+    @staticmethod
+    def get_version(book_id):
+        """``(version, updated_at)`` of one book, or ``(None, None)`` if it does not exist.
+
+        Read through the book cache, so the version always matches what
+        ``get_by_id`` returns for the same page.
+        """
+        book = Book.get_by_id(book_id)
+        if not book:
+            return None, None
+        return book.get('version', 0), book.get('updated_at')
+
+    @staticmethod
+    def collection_version():
+        """``(version, updated_at)`` of the catalog as a whole; bumped by every book write."""
+        counter = mongo.db.counters.find_one({'_id': 'books'})
+        if not counter:
+            return 0, None
+        return counter['version'], counter.get('updated_at')
+
+    @staticmethod
+    def _touch_collection(now=None):
+        counter = mongo.db.counters.find_one_and_update(
+            {'_id': 'books'},
+            {'$inc': {'version': 1}, '$set': {'updated_at': now or datetime.utcnow()}},
+            projection={'version': 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        # If ours was the only write since the last check, the caller has
+        # already evicted what it changed; no need to drop the whole cache
+        with _book_cache_lock:
+            if _book_cache_state['version'] == counter['version'] - 1:
+                _book_cache_state['version'] = counter['version']
+
+    @staticmethod
+    def iter_covers(missing_variants_only=True):
+        query = {'image': {'$nin': [None, '']}}
+        if missing_variants_only:
+            query['image_variants'] = None
+        return mongo.db.books.find(query, {'image': 1})
+
+    @staticmethod
+    def search(query, filters=None, limit=None, skip=0):
+        """Relevance-ranked full-text search over title, author, genre and description.
+
+        Returns ``BookSummary`` records.
+        """
+        query = (query or '').strip()
+        if not query:
+            return []
+        criteria = dict(filters or {})
+        criteria['$text'] = {'$search': query}
+        projection = dict(Book.SUMMARY_PROJECTION, score={'$meta': 'textScore'})
+        cursor = mongo.db.books.find(criteria, projection).sort([('score', {'$meta': 'textScore'})])
+        if skip:
+            cursor = cursor.skip(skip)
+        return [BookSummary(doc) for doc in cursor.limit(limit or current_app.config['SEARCH_RESULT_LIMIT'])]
+
+    @staticmethod
+    def search_page(query, filters=None, after=None, before=None, per_page=None):
+        """Page through search results with the same shape as ``Book.paginate``.
+
+        Relevance order has no stable key to seek on, so the cursors here are
+        result offsets.
+        """
+        per_page = per_page or current_app.config['BOOKS_PER_PAGE']
+        start = Book._parse_offset(after)
+        if start is None:
+            end = Book._parse_offset(before)
+            start = max(0, end - per_page) if end is not None else 0
+
+        books = Book.search(query, filters=filters, limit=per_page + 1, skip=start)
+        has_next = len(books) > per_page
+        books = books[:per_page]
+        return {
+            'items': books,
+            'per_page': per_page,
+            'next_cursor': str(start + per_page) if has_next else None,
+            'prev_cursor': str(start) if start > 0 else None,
+            'total': None
+        }
+
+    @staticmethod
+    def _parse_offset(cursor):
+        try:
+            offset = int(cursor)
+        except (TypeError, ValueError):
+            return None
+        return offset if offset >= 0 else None
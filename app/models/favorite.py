@@ -0,0 +1,179 @@
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from app import mongo
+from app.models.pagination import parse_cursor
+
+
+class Favorite:
+    """One document per (user, book) pair in the ``favorites`` collection.
+
+    Each book carries a denormalized ``favorite_count`` that ``add`` and
+    ``remove`` adjust only when a pair is actually inserted or deleted, so
+    the counter stays exact under concurrent toggles.
+    """
+
+    @staticmethod
+    def ensure_indexes():
+        mongo.db.favorites.create_index(
+            [('user_id', ASCENDING), ('book_id', ASCENDING)], unique=True
+        )
+        # Covers a user's favorites list, newest first
+        mongo.db.favorites.create_index(
+            [('user_id', ASCENDING), ('created_at', DESCENDING), ('book_id', ASCENDING)]
+        )
+        mongo.db.favorites.create_index('book_id')
+
+    @staticmethod
+    def add(user_id, book_id):
+        """Returns True if the book was not a favorite yet."""
+        user_id, book_id = parse_cursor(user_id), parse_cursor(book_id)
+        if user_id is None or book_id is None:
+            return False
+        try:
+            result = mongo.db.favorites.update_one(
+                {'user_id': user_id, 'book_id': book_id},
+                {'$setOnInsert': {'created_at': datetime.utcnow()}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # A concurrent add of the same pair won the upsert
+            return False
+        if result.upserted_id is None:
+            return False
+        Favorite._adjust_counts([book_id], 1)
+        return True
+
+    @staticmethod
+    def remove(user_id, book_id):
+        """Returns when the removed favorite was added, or None if the book was not a favorite."""
+        user_id, book_id = parse_cursor(user_id), parse_cursor(book_id)
+        if user_id is None or book_id is None:
+            return None
+        removed = mongo.db.favorites.find_one_and_delete(
+            {'user_id': user_id, 'book_id': book_id}, projection={'created_at': 1}
+        )
+        if not removed:
+            return None
+        Favorite._adjust_counts([book_id], -1)
+        return removed.get('created_at') or datetime.min
+
+    @staticmethod
+    def exists(user_id, book_id):
+        user_id, book_id = parse_cursor(user_id), parse_cursor(book_id)
+        if user_id is None or book_id is None:
+            return False
+        return mongo.db.favorites.find_one({'user_id': user_id, 'book_id': book_id}, {'_id': 1}) is not None
+
+    @staticmethod
+    def book_ids(user_id, limit=None):
+        """Ids of a user's favorite books as strings, most recently added first."""
+        user_id = parse_cursor(user_id)
+        if user_id is None:
+            return []
+        cursor = mongo.db.favorites.find(
+            {'user_id': user_id}, {'book_id': 1, '_id': 0}
+        ).sort('created_at', DESCENDING)
+        if limit:
+            cursor = cursor.limit(limit)
+        return [str(doc['book_id']) for doc in cursor]
+
+    @staticmethod
+    def among(user_id, book_ids):
+        """The subset of ``book_ids`` the user has favorited, as a set of strings."""
+        user_id = parse_cursor(user_id)
+        object_ids = [oid for oid in map(parse_cursor, book_ids) if oid is not None]
+        if user_id is None or not object_ids:
+            return set()
+        cursor = mongo.db.favorites.find(
+            {'user_id': user_id, 'book_id': {'$in': object_ids}}, {'book_id': 1, '_id': 0}
+        )
+        return {str(doc['book_id']) for doc in cursor}
+
+    @staticmethod
+    def remove_for_book(book_id):
+        book_id = parse_cursor(book_id)
+        if book_id is not None:
+            mongo.db.favorites.delete_many({'book_id': book_id})
+
+    @staticmethod
+    def remove_for_user(user_id):
+        """Delete all of a user's favorites; returns the book ids, most recently added first."""
+        user_id = parse_cursor(user_id)
+        if user_id is None:
+            return []
+        book_ids = [doc['book_id'] for doc in mongo.db.favorites.find(
+            {'user_id': user_id}, {'book_id': 1}
+        ).sort('created_at', DESCENDING)]
+        mongo.db.favorites.delete_many({'user_id': user_id})
+        Favorite._adjust_counts(book_ids, -1)
+        return book_ids
+
+    @staticmethod
+    def _adjust_counts(book_ids, delta):
+        # The version bump keeps the book's ETag in step with the count it shows
+        if book_ids:
+            from app.models.book import Book
+            mongo.db.books.update_many(
+                {'_id': {'$in': book_ids}},
+                {'$inc': {'favorite_count': delta, 'version': 1}}
+            )
+            Book.invalidate_cache(book_ids)
+
+    @staticmethod
+    def migrate_embedded(batch_size=1000):
+        """Move ``users.favorites`` arrays into the collection.
+
+        Safe to re-run: pairs are upserted and each user's array is only
+        removed after its pairs are written. The array was in the order the
+        books were added, so each pair is dated a millisecond after the one
+        before it and ``book_ids`` keeps that order. Returns ``(users,
+        favorites)`` migrated. Run ``recount`` afterwards.
+        """
+        users = favorites = 0
+        cursor = mongo.db.users.find({'favorites': {'$exists': True}}, {'favorites': 1})
+        for user in cursor:
+            book_ids = [book_id for book_id in map(parse_cursor, user.get('favorites') or [])
+                        if book_id is not None]
+            book_ids = list(dict.fromkeys(book_ids))
+            # The last book in the array is the newest, dated now
+            start = datetime.utcnow() - timedelta(milliseconds=len(book_ids))
+            ops = [
+                UpdateOne(
+                    {'user_id': user['_id'], 'book_id': book_id},
+                    {'$setOnInsert': {'created_at': start + timedelta(milliseconds=position + 1)}},
+                    upsert=True
+                )
+                for position, book_id in enumerate(book_ids)
+            ]
+            for offset in range(0, len(ops), batch_size):
+                mongo.db.favorites.bulk_write(ops[offset:offset + batch_size], ordered=False)
+            mongo.db.users.update_one(
+                {'_id': user['_id']},
+                {'$unset': {'favorites': ''}, '$inc': {'version': 1}}
+            )
+            users += 1
+            favorites += len(ops)
+        return users, favorites
+
+    @staticmethod
+    def recount(batch_size=1000):
+        """Recompute every book's ``favorite_count`` from the collection."""
+        from app.models.book import Book
+        # Version bumps as in _adjust_counts
+        mongo.db.books.update_many({'favorite_count': {'$ne': 0}},
+                                   {'$set': {'favorite_count': 0}, '$inc': {'version': 1}})
+        ops = []
+        updated = 0
+        for row in mongo.db.favorites.aggregate([{'$group': {'_id': '$book_id', 'count': {'$sum': 1}}}]):
+            ops.append(UpdateOne({'_id': row['_id']},
+                                 {'$set': {'favorite_count': row['count']}, '$inc': {'version': 1}}))
+            if len(ops) >= batch_size:
+                updated += mongo.db.books.bulk_write(ops, ordered=False).matched_count
+                ops = []
+        if ops:
+            updated += mongo.db.books.bulk_write(ops, ordered=False).matched_count
+        # Usually run from the CLI; the catalog version makes every worker drop its cache
+        Book._touch_collection()
+        Book.invalidate_cache()
+        return updated
@@ -0,0 +1,103 @@
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+
+
+def parse_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        return ObjectId(cursor)
+    except (InvalidId, TypeError):
+        return None
+
+
+def keyset_page(collection, query, projection, after=None, before=None, per_page=20, record=dict):
+    """One page of ``collection`` in ``_id`` order, newest first.
+
+    ``after``/``before`` are the cursors handed out as ``next_cursor`` and
+    ``prev_cursor`` on a previous page. Unknown or malformed cursors fall
+    back to the first page. Each document is passed through ``record``.
+    """
+    query = dict(query or {})
+    after = parse_cursor(after)
+    before = parse_cursor(before) if after is None else None
+
+    if after is not None:
+        query['_id'] = {'$lt': after}
+        direction = -1
+    elif before is not None:
+        query['_id'] = {'$gt': before}
+        direction = 1
+    else:
+        direction = -1
+
+    # Fetch one extra row to know whether another page exists
+    docs = list(collection.find(query, projection).sort('_id', direction).limit(per_page + 1))
+    has_more = len(docs) > per_page
+    docs = docs[:per_page]
+    if direction == 1:
+        docs.reverse()
+
+    if before is not None:
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, after is not None
+
+    return {
+        'items': [record(doc) for doc in docs],
+        'per_page': per_page,
+        'next_cursor': str(docs[-1]['_id']) if docs and has_next else None,
+        'prev_cursor': str(docs[0]['_id']) if docs and has_prev else None,
+        'total': None
+    }
+
+
+def field_keyset_page(collection, query, projection, field, after=None, before=None, per_page=20, record=dict):
+    """Like ``keyset_page`` but in ascending ``(field, _id)`` order.
+
+    Needs an index on ``(field, _id)``. Cursors are ``"<_id>:<field value>"``
+    and ``field`` must hold strings.
+    """
+    query = dict(query or {})
+    after = _parse_field_cursor(after)
+    before = _parse_field_cursor(before) if after is None else None
+
+    if after is not None:
+        bound, direction = after, 1
+    elif before is not None:
+        bound, direction = before, -1
+    else:
+        bound, direction = None, 1
+    if bound is not None:
+        oid, value = bound
+        op = '$gt' if direction == 1 else '$lt'
+        seek = {'$or': [{field: {op: value}}, {field: value, '_id': {op: oid}}]}
+        query = {'$and': [query, seek]} if query else seek
+
+    docs = list(collection.find(query, projection).sort([(field, direction), ('_id', direction)]).limit(per_page + 1))
+    has_more = len(docs) > per_page
+    docs = docs[:per_page]
+    if direction == -1:
+        docs.reverse()
+
+    if before is not None:
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, after is not None
+
+    def cursor(doc):
+        return f"{doc['_id']}:{doc.get(field) or ''}"
+
+    return {
+        'items': [record(doc) for doc in docs],
+        'per_page': per_page,
+        'next_cursor': cursor(docs[-1]) if docs and has_next else None,
+        'prev_cursor': cursor(docs[0]) if docs and has_prev else None,
+        'total': None
+    }
+
+
+def _parse_field_cursor(cursor):
+    oid, _, value = (cursor or '').partition(':')
+    oid = parse_cursor(oid)
+    return (oid, value) if oid is not None else None
@@ -0,0 +1,306 @@
+import heapq
+import math
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import combinations, groupby
+from pymongo import ASCENDING, DESCENDING, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from flask import current_app
+from app import mongo
+from app.models.pagination import parse_cursor
+
+_lock = threading.Lock()
+_executor = None
+
+
+class Recommendation:
+    """"Readers also liked" lists from favorite co-occurrence.
+
+    ``book_pairs`` is the sparse co-occurrence matrix: one ``{a, b, count}``
+    document per ordered pair of books favorited by the same reader. The
+    ``recommendations`` collection stores each book's top-K neighbours by
+    cosine similarity, ``count / sqrt(favorites(a) * favorites(b))``, so the
+    request path is a single ``_id`` lookup. ``rebuild`` recomputes
+    everything; favorite toggles update the affected pairs and lists in a
+    background thread. Only the ``RECOMMENDATION_BASKET_LIMIT`` most recent
+    favorites of each reader (their basket) are paired, which bounds the
+    work per reader; both paths apply the limit the same way. Documents the
+    incremental path writes while a rebuild runs are left alone by it.
+    """
+
+    @staticmethod
+    def ensure_indexes():
+        mongo.db.book_pairs.create_index([('a', ASCENDING), ('b', ASCENDING)], unique=True)
+        mongo.db.book_pairs.create_index('b')
+        # Finds the lists that show a book, see book_changed
+        mongo.db.recommendations.create_index('similar.book_id')
+
+    @staticmethod
+    def similar_ids(book_id, limit=None):
+        book_id = parse_cursor(book_id)
+        if book_id is None:
+            return []
+        doc = mongo.db.recommendations.find_one({'_id': book_id}, {'similar': 1})
+        similar = doc['similar'] if doc else []
+        return [str(entry['book_id']) for entry in similar[:limit]]
+
+    @staticmethod
+    def stamp(book_id):
+        """Changes whenever the book's list is rewritten or a book on it is renamed; part of the detail page ETag."""
+        book_id = parse_cursor(book_id)
+        doc = None
+        if book_id:
+            doc = mongo.db.recommendations.find_one({'_id': book_id}, {'updated_at': 1, 'revision': 1})
+        return f"{doc['updated_at'].isoformat()}/{doc.get('revision', 0)}" if doc else None
+
+    @staticmethod
+    def for_books(book_ids, exclude=(), limit=None):
+        """Ids of the books most similar to any of ``book_ids``, best first."""
+        object_ids = [oid for oid in map(parse_cursor, book_ids) if oid is not None]
+        if not object_ids:
+            return []
+        exclude = {str(book_id) for book_id in exclude} | {str(oid) for oid in object_ids}
+        scores = Counter()
+        for doc in mongo.db.recommendations.find({'_id': {'$in': object_ids}}, {'similar': 1}):
+            for entry in doc['similar']:
+                if str(entry['book_id']) not in exclude:
+                    scores[str(entry['book_id'])] += entry['score']
+        return [book_id for book_id, _ in scores.most_common(limit)]
+
+    @staticmethod
+    def rebuild(batch_size=1000):
+        """Recompute the co-occurrence matrix and every top-K list from ``favorites``.
+
+        Returns ``(pairs, books)`` written.
+        """
+        basket_limit = current_app.config['RECOMMENDATION_BASKET_LIMIT']
+        top_k = current_app.config['RECOMMENDATION_TOP_K']
+        build = datetime.utcnow()
+
+        matrix = defaultdict(Counter)
+        cursor = mongo.db.favorites.find({}, {'user_id': 1, 'book_id': 1, '_id': 0}).sort(
+            [('user_id', ASCENDING), ('created_at', DESCENDING)]
+        )
+        for _, rows in groupby(cursor, key=lambda row: row['user_id']):
+            basket = [row['book_id'] for row in rows][:basket_limit]
+            for a, b in combinations(basket, 2):
+                matrix[a][b] += 1
+                matrix[b][a] += 1
+
+        # Same denominators as refresh
+        totals = Counter({
+            book['_id']: book['favorite_count']
+            for book in mongo.db.books.find({'favorite_count': {'$gt': 0}}, {'favorite_count': 1})
+        })
+
+        # Incremental updates stamp updated_at; anything they touched since
+        # the rebuild started is newer than its snapshot and is kept
+        untouched = {'$not': {'$gte': build}}
+        pairs = _write_batched(mongo.db.book_pairs, (
+            ReplaceOne({'a': a, 'b': b, 'updated_at': untouched},
+                       {'a': a, 'b': b, 'count': count, 'build': build}, upsert=True)
+            for a, row in matrix.items() for b, count in row.items()
+        ), batch_size)
+        mongo.db.book_pairs.delete_many({'build': {'$ne': build}, 'updated_at': untouched})
+
+        books = _write_batched(mongo.db.recommendations, (
+            ReplaceOne({'_id': a, 'updated_at': untouched},
+                       _recommendation(a, row, totals, top_k, build), upsert=True)
+            for a, row in matrix.items()
+        ), batch_size)
+        mongo.db.recommendations.delete_many({'updated_at': {'$lt': build}})
+        return pairs, books
+
+    @staticmethod
+    def favorite_changed_async(user_id, book_id, delta, added_at=None):
+        """Queue the incremental update for one favorite toggle.
+
+        Removals pass ``added_at``, when the removed favorite was added.
+        """
+        return _submit(Recommendation._apply_change, user_id, book_id, delta, _config(), added_at)
+
+    @staticmethod
+    def _apply_change(user_id, book_id, delta, config, added_at):
+        try:
+            Recommendation.favorite_changed(user_id, book_id, delta, config, added_at)
+        except Exception as e:
+            print(f"⚠ Could not update recommendations for {book_id}: {e}")
+
+    @staticmethod
+    def reader_removed_async(book_ids):
+        """Queue ``reader_removed`` for a deleted reader's favorites."""
+        return _submit(Recommendation._apply_reader_removed, list(book_ids), _config())
+
+    @staticmethod
+    def _apply_reader_removed(book_ids, config):
+        try:
+            Recommendation.reader_removed(book_ids, config)
+        except Exception as e:
+            print(f"⚠ Could not update recommendations for {len(book_ids)} book(s): {e}")
+
+    @staticmethod
+    def reader_removed(book_ids, config):
+        """Take a deleted reader's basket out of the pairs and refresh the affected lists.
+
+        ``book_ids`` are all of the reader's favorites, most recent first, as
+        they were before the favorites were deleted.
+        """
+        basket = [oid for oid in map(parse_cursor, book_ids) if oid is not None]
+        basket = basket[:config['RECOMMENDATION_BASKET_LIMIT']]
+        now = datetime.utcnow()
+        ops = [
+            UpdateOne({'a': a, 'b': b}, {'$inc': {'count': -1}, '$set': {'updated_at': now}})
+            for pair in combinations(basket, 2) for a, b in (pair, pair[::-1])
+        ]
+        _apply_pair_changes(ops, set(basket), config['RECOMMENDATION_TOP_K'])
+
+    @staticmethod
+    def favorite_changed(user_id, book_id, delta, config, added_at=None):
+        """Update the pairs of the reader's basket after one toggle and refresh the affected lists.
+
+        The toggle has already been applied to ``favorites``. An added book
+        enters the basket and may push its oldest book out; a removed book
+        that was in the basket lets the next most recent favorite in.
+        """
+        from app.models.favorite import Favorite
+        limit = config['RECOMMENDATION_BASKET_LIMIT']
+        book_id, user_id = parse_cursor(book_id), parse_cursor(user_id)
+        if book_id is None or user_id is None:
+            return
+        current = [parse_cursor(other) for other in Favorite.book_ids(user_id, limit=limit + 1)]
+
+        changes = []
+        if delta > 0:
+            if book_id not in current[:limit]:
+                return
+            basket = [other for other in current[:limit] if other != book_id]
+            changes.append((book_id, basket, 1))
+            if len(current) > limit:
+                changes.append((current[limit], basket, -1))
+        else:
+            newer = mongo.db.favorites.count_documents(
+                {'user_id': user_id, 'created_at': {'$gt': added_at or datetime.min}}, limit=limit
+            )
+            if newer >= limit:
+                return
+            basket = current[:limit - 1]
+            changes.append((book_id, basket, -1))
+            if len(current) >= limit:
+                changes.append((current[limit - 1], basket, 1))
+
+        now = datetime.utcnow()
+        ops = []
+        touched = {book_id}
+        for book, others, _ in changes:
+            touched.add(book)
+            touched.update(others)
+        for book, others, change in changes:
+            for other in others:
+                for a, b in ((book, other), (other, book)):
+                    ops.append(UpdateOne({'a': a, 'b': b},
+                                         {'$inc': {'count': change}, '$set': {'updated_at': now}},
+                                         upsert=True))
+        _apply_pair_changes(ops, touched, config['RECOMMENDATION_TOP_K'])
+
+    @staticmethod
+    def refresh(book_ids, top_k):
+        """Rewrite the top-K lists of ``book_ids`` from their stored pairs."""
+        rows = defaultdict(Counter)
+        for pair in mongo.db.book_pairs.find({'a': {'$in': list(book_ids)}}, {'a': 1, 'b': 1, 'count': 1}):
+            rows[pair['a']][pair['b']] = pair['count']
+        neighbours = set(book_ids).union(*rows.values())
+        totals = Counter({
+            book['_id']: book.get('favorite_count', 0)
+            for book in mongo.db.books.find({'_id': {'$in': list(neighbours)}}, {'favorite_count': 1})
+        })
+        now = datetime.utcnow()
+        ops = [
+            ReplaceOne({'_id': book_id}, _recommendation(book_id, rows[book_id], totals, top_k, now), upsert=True)
+            for book_id in book_ids
+        ]
+        if ops:
+            mongo.db.recommendations.bulk_write(ops, ordered=False)
+
+    @staticmethod
+    def book_changed(book_id):
+        """Change the stamp of every list that shows ``book_id``, after its title or author changed."""
+        book_id = parse_cursor(book_id)
+        if book_id is not None:
+            mongo.db.recommendations.update_many({'similar.book_id': book_id}, {'$inc': {'revision': 1}})
+
+    @staticmethod
+    def remove_book(book_id):
+        """Drop a deleted book's pairs and list, and refresh the lists of the books paired with it."""
+        book_id = parse_cursor(book_id)
+        if book_id is None:
+            return
+        # Pairs are stored in both directions, so these are all its neighbours
+        neighbours = [pair['a'] for pair in mongo.db.book_pairs.find({'b': book_id}, {'a': 1})]
+        mongo.db.book_pairs.delete_many({'$or': [{'a': book_id}, {'b': book_id}]})
+        mongo.db.recommendations.delete_one({'_id': book_id})
+        if neighbours:
+            Recommendation.refresh(neighbours, current_app.config['RECOMMENDATION_TOP_K'])
+
+
+def _config():
+    return {key: current_app.config[key] for key in ('RECOMMENDATION_BASKET_LIMIT', 'RECOMMENDATION_TOP_K')}
+
+
+def _submit(fn, *args):
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                # One thread, so updates to the same pairs never interleave
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='recommendations')
+    return _executor.submit(fn, *args)
+
+
+def _apply_pair_changes(ops, touched, top_k):
+    if not ops:
+        return
+    mongo.db.book_pairs.bulk_write(ops, ordered=False)
+    mongo.db.book_pairs.delete_many({'count': {'$lte': 0}, 'a': {'$in': list(touched)}})
+    Recommendation.refresh(list(touched), top_k)
+
+
+def _recommendation(book_id, row, totals, top_k, now):
+    def score(item):
+        other, count = item
+        return count / math.sqrt(max(totals[book_id], 1) * max(totals[other], 1))
+
+    best = heapq.nlargest(top_k, row.items(), key=score)
+    return {
+        '_id': book_id,
+        'similar': [{'book_id': other, 'score': round(score((other, count)), 6), 'count': count}
+                    for other, count in best],
+        'updated_at': now
+    }
+
+
+def _write_batched(collection, ops, batch_size):
+    written = 0
+    batch = []
+    for op in ops:
+        batch.append(op)
+        if len(batch) >= batch_size:
+            written += _write_skipping_newer(collection, batch)
+            batch = []
+    if batch:
+        written += _write_skipping_newer(collection, batch)
+    return written
+
+
+def _write_skipping_newer(collection, batch):
+    # A replace whose filter excludes a newer document falls through to an
+    # insert and hits the unique key; that document is meant to be kept
+    try:
+        collection.bulk_write(batch, ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get('writeErrors', [])
+        if any(error['code'] != 11000 for error in errors):
+            raise
+        return len(batch) - len(errors)
+    return len(batch)
@@ -0,0 +1,117 @@
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from app import mongo
+
+STATS_ID = 'library'
+_refresh_lock = threading.Lock()
+
+
+def _key(name):
+    # Mongo field names cannot contain dots or start with '$'
+    return str(name).replace('.', '．').replace('$', '＄')
+
+
+def _unkey(key):
+    return key.replace('．', '.').replace('＄', '$')
+
+
+class Stats:
+    """Library counters kept in a single ``stats`` document.
+
+    Writes in ``Book``/``User`` adjust the counters with ``$inc``; a full
+    aggregation recompute replaces the document whenever it is missing or
+    older than ``STATS_RECOMPUTE_INTERVAL`` to correct any drift.
+    """
+
+    @staticmethod
+    def compute():
+        genres, roles = {}, {}
+        for row in mongo.db.books.aggregate([{'$group': {'_id': '$genre', 'count': {'$sum': 1}}}]):
+            key = _key(row['_id'] or 'Unknown')
+            genres[key] = genres.get(key, 0) + row['count']
+        for row in mongo.db.users.aggregate([{'$group': {'_id': '$role', 'count': {'$sum': 1}}}]):
+            key = _key(row['_id'] or 'client')
+            roles[key] = roles.get(key, 0) + row['count']
+        return {
+            'total_books': mongo.db.books.count_documents({}),
+            'total_users': mongo.db.users.count_documents({}),
+            'genres': genres,
+            'user_roles': roles
+        }
+
+    @staticmethod
+    def recompute():
+        stats = Stats.compute()
+        stats['computed_at'] = datetime.utcnow()
+        mongo.db.stats.replace_one({'_id': STATS_ID}, stats, upsert=True)
+        return stats
+
+    @staticmethod
+    def get():
+        stats = mongo.db.stats.find_one({'_id': STATS_ID})
+        if stats is None:
+            stats = Stats.recompute()
+        else:
+            max_age = timedelta(seconds=current_app.config['STATS_RECOMPUTE_INTERVAL'])
+            if datetime.utcnow() - stats['computed_at'] > max_age:
+                Stats._recompute_in_background()
+
+        user_roles = {'admin': 0, 'client': 0}
+        user_roles.update({_unkey(k): v for k, v in stats.get('user_roles', {}).items()})
+        return {
+            'total_books': stats.get('total_books', 0),
+            'total_users': stats.get('total_users', 0),
+            'genres': {_unkey(k): v for k, v in stats.get('genres', {}).items() if v > 0},
+            'user_roles': user_roles
+        }
+
+    @staticmethod
+    def _recompute_in_background():
+        if not _refresh_lock.acquire(blocking=False):
+            return
+
+        def run():
+            try:
+                Stats.recompute()
+            except Exception as e:
+                print(f"⚠ Stats recompute failed: {e}")
+            finally:
+                _refresh_lock.release()
+
+        threading.Thread(target=run, daemon=True).start()
+
+    @staticmethod
+    def _inc(changes):
+        changes = {k: v for k, v in changes.items() if v}
+        if changes:
+            # No upsert: a missing document is rebuilt in full by Stats.get()
+            mongo.db.stats.update_one({'_id': STATS_ID}, {'$inc': changes})
+
+    @staticmethod
+    def book_added(genre):
+        Stats._inc({'total_books': 1, f'genres.{_key(genre or "Unknown")}': 1})
+
+    @staticmethod
+    def book_removed(genre):
+        Stats._inc({'total_books': -1, f'genres.{_key(genre or "Unknown")}': -1})
+
+    @staticmethod
+    def book_genre_changed(old_genre, new_genre):
+        old_genre, new_genre = old_genre or 'Unknown', new_genre or 'Unknown'
+        if old_genre != new_genre:
+            Stats._inc({f'genres.{_key(old_genre)}': -1, f'genres.{_key(new_genre)}': 1})
+
+    @staticmethod
+    def user_added(role):
+        Stats._inc({'total_users': 1, f'user_roles.{_key(role or "client")}': 1})
+
+    @staticmethod
+    def user_removed(role):
+        Stats._inc({'total_users': -1, f'user_roles.{_key(role or "client")}': -1})
+
+    @staticmethod
+    def role_changed(old_role, new_role):
+        old_role, new_role = old_role or 'client', new_role or 'client'
+        if old_role != new_role:
+            Stats._inc({f'user_roles.{_key(old_role)}': -1, f'user_roles.{_key(new_role)}': 1})
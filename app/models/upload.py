@@ -0,0 +1,33 @@
+from pymongo import ReturnDocument
+from app import mongo
+
+
+class Upload:
+    """Reference counts for content-addressed files in ``UPLOAD_FOLDER``, keyed by digest."""
+
+    @staticmethod
+    def get(digest):
+        return mongo.db.uploads.find_one({'_id': digest})
+
+    @staticmethod
+    def acquire(digest, path):
+        """Take one reference; returns the stored path, which is ``path`` unless the digest is already known."""
+        upload = mongo.db.uploads.find_one_and_update(
+            {'_id': digest},
+            {'$inc': {'refs': 1}, '$setOnInsert': {'path': path}},
+            projection={'path': 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return upload['path']
+
+    @staticmethod
+    def release(digest):
+        """Drop one reference; returns the stored path once nothing refers to it any more.
+
+        Only the caller whose delete removes the record gets the path, so a
+        reference taken in between by ``acquire`` keeps the file.
+        """
+        mongo.db.uploads.update_one({'_id': digest}, {'$inc': {'refs': -1}})
+        upload = mongo.db.uploads.find_one_and_delete({'_id': digest, 'refs': {'$lte': 0}}, projection={'path': 1})
+        return upload['path'] if upload else None
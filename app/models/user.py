@@ -1,9 +1,47 @@
+import re
+import time
+from flask import current_app
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING
 from app import mongo
+from app.cache import TTLCache
+from app.models.pagination import field_keyset_page, keyset_page
+from app.passwords import hash_password, verify_password, needs_rehash, PasswordHasherBusy
+from app.models.stats import Stats
+from app.models.favorite import Favorite
+from app.models.recommendation import Recommendation
+
+# Session user documents keyed by id, stored as (user_data, last_verified_at)
+_user_cache = TTLCache(maxsize=10000, name='users')
+_user_cache_counters = {'revalidations': 0, 'stale': 0}
+
+
+class UserSummary:
+    """Row of the user admin table; never holds the password hash or favorites."""
+    __slots__ = ('id', 'username', 'email', 'role', 'is_active_user')
+
+    def __init__(self, user_data):
+        self.id = str(user_data['_id'])
+        self.username = user_data.get('username')
+        self.email = user_data.get('email')
+        self.role = user_data.get('role', 'client')
+        self.is_active_user = user_data.get('is_active', True)
+
+    def is_active(self):
+        return self.is_active_user
+
+    def is_admin(self):
+        return self.role in ['admin', 'super_admin']
+
+    def is_super_admin(self):
+        return self.role == 'super_admin'
+
 
 class User(UserMixin):
+    ROLES = ('client', 'admin', 'super_admin')
+    LIST_PROJECTION = {'username': 1, 'email': 1, 'role': 1, 'is_active': 1}
+
     def __init__(self, user_data):
         self.id = str(user_data['_id'])
         self.username = user_data['username']
@@ -11,6 +49,9 @@ class User(UserMixin):
         self.password_hash = user_data['password_hash']
         self.role = user_data.get('role', 'client')
         self.is_active_user = user_data.get('is_active', True)
+        self.version = user_data.get('version', 0)
+        self._favorites = None
+        self._favorite_set = None
     
     def is_active(self):
         return self.is_active_user
@@ -22,11 +63,19 @@ class User(UserMixin):
         return self.role == 'super_admin'
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+    
+    def rehash_password_if_needed(self, password):
+        """Re-hash with the configured parameters after a successful login; skipped if the hasher is busy."""
+        if needs_rehash(self.password_hash):
+            try:
+                self.update_password(password)
+            except PasswordHasherBusy:
+                pass
     
     @staticmethod
     def create(username, email, password, role='client'):
-        password_hash = generate_password_hash(password)
+        password_hash = hash_password(password)
         user_data = {
             'username': username,
             'email': email,
@@ -36,6 +85,7 @@ class User(UserMixin):
         }
         result = mongo.db.users.insert_one(user_data)
         user_data['_id'] = result.inserted_id
+        Stats.user_added(role)
         return User(user_data)
     
     @staticmethod
@@ -52,46 +102,178 @@ class User(UserMixin):
             return None
     
     @staticmethod
-    def get_all():
-        users = mongo.db.users.find()
-        return [User(user) for user in users]
+    def get_cached(user_id):
+        """``get_by_id`` for the session loader, served from a per-worker cache.
+
+        Every write to a user bumps its ``version`` field. A cached entry is
+        trusted for ``USER_CACHE_VERIFY_INTERVAL`` seconds; after that its
+        version is compared against the database with a one-field read, so
+        changes made by other workers (e.g. a role revocation) show up
+        within that interval.
+        """
+        user_id = str(user_id)
+        entry = _user_cache.get(user_id)
+        now = time.monotonic()
+        try:
+            if entry is not None:
+                user_data, verified_at = entry
+                if now - verified_at < current_app.config['USER_CACHE_VERIFY_INTERVAL']:
+                    return User(user_data)
+                _user_cache_counters['revalidations'] += 1
+                stamp = mongo.db.users.find_one({'_id': ObjectId(user_id)}, {'version': 1})
+                if stamp and stamp.get('version', 0) == user_data.get('version', 0):
+                    _user_cache.set(user_id, (user_data, now), ttl=current_app.config['USER_CACHE_TTL'])
+                    return User(user_data)
+                _user_cache_counters['stale'] += 1
+
+            # Accounts not yet migrated may still carry an embedded favorites array
+            user_data = mongo.db.users.find_one({'_id': ObjectId(user_id)}, {'favorites': 0})
+        except:
+            return None
+        if not user_data:
+            _user_cache.pop(user_id)
+            return None
+        _user_cache.set(user_id, (user_data, now), ttl=current_app.config['USER_CACHE_TTL'])
+        return User(user_data)
+    
+    @staticmethod
+    def invalidate_cache(user_id):
+        _user_cache.pop(str(user_id))
+    
+    @staticmethod
+    def cache_stats():
+        stats = _user_cache.stats()
+        stats.update(_user_cache_counters)
+        return stats
+    
+    @staticmethod
+    def ensure_indexes():
+        # Anchored, case-sensitive prefix searches seek on these and page in their order
+        mongo.db.users.create_index([('username', ASCENDING), ('_id', ASCENDING)])
+        mongo.db.users.create_index([('email', ASCENDING), ('_id', ASCENDING)])
+        mongo.db.users.create_index([('role', ASCENDING), ('_id', DESCENDING)])
+    
+    @staticmethod
+    def search_field(search):
+        """The field a user admin search matches: ``email`` if it contains ``@``, else ``username``."""
+        search = (search or '').strip()
+        if not search:
+            return None
+        return 'email' if '@' in search else 'username'
+    
+    @staticmethod
+    def build_filters(search=None, role=None):
+        """Username or email prefix search (see ``search_field``) and role filter for the user admin."""
+        filters = {}
+        field = User.search_field(search)
+        if field:
+            filters[field] = {'$regex': '^' + re.escape(search.strip())}
+        if role == 'client':
+            # Accounts created before roles existed count as clients
+            filters['role'] = {'$in': ['client', None]}
+        elif role in User.ROLES:
+            filters['role'] = role
+        return filters
+    
+    @staticmethod
+    def paginate(filters=None, after=None, before=None, per_page=None, with_total=False, order_by=None):
+        """``UserSummary`` rows, newest accounts first or in ``order_by`` order.
+
+        Prefix searches pass their ``search_field`` as ``order_by`` so the
+        matching index range is read in order instead of sorting every
+        match. See ``keyset_page`` and ``field_keyset_page`` for the cursors.
+        """
+        per_page = per_page or current_app.config['USERS_PER_PAGE']
+        if order_by:
+            page = field_keyset_page(mongo.db.users, filters, User.LIST_PROJECTION, order_by,
+                                     after=after, before=before, per_page=per_page, record=UserSummary)
+        else:
+            page = keyset_page(mongo.db.users, filters, User.LIST_PROJECTION,
+                               after=after, before=before, per_page=per_page, record=UserSummary)
+        if with_total:
+            page['total'] = User.count(filters)
+        return page
+    
+    @staticmethod
+    def count(filters=None):
+        if filters:
+            return mongo.db.users.count_documents(filters)
+        return mongo.db.users.estimated_document_count()
     
     @staticmethod
     def update_role(user_id, role):
-        mongo.db.users.update_one(
+        previous = mongo.db.users.find_one_and_update(
             {'_id': ObjectId(user_id)},
-            {'$set': {'role': role}}
+            {'$set': {'role': role}, '$inc': {'version': 1}},
+            projection={'role': 1}
         )
+        User.invalidate_cache(user_id)
+        if previous:
+            Stats.role_changed(previous.get('role'), role)
     
     @staticmethod
     def delete(user_id):
-        mongo.db.users.delete_one({'_id': ObjectId(user_id)})
+        deleted = mongo.db.users.find_one_and_delete({'_id': ObjectId(user_id)}, projection={'role': 1})
+        User.invalidate_cache(user_id)
+        if deleted:
+            book_ids = Favorite.remove_for_user(user_id)
+            if book_ids:
+                Recommendation.reader_removed_async(book_ids)
+            Stats.user_removed(deleted.get('role'))
     
     def add_favorite(self, book_id):
-        mongo.db.users.update_one(
-            {'_id': ObjectId(self.id)},
-            {'$addToSet': {'favorites': str(book_id)}}
-        )
+        if Favorite.add(self.id, book_id):
+            self._favorites_changed()
+            Recommendation.favorite_changed_async(self.id, book_id, 1)
     
     def remove_favorite(self, book_id):
-        mongo.db.users.update_one(
-            {'_id': ObjectId(self.id)},
-            {'$pull': {'favorites': str(book_id)}}
-        )
+        added_at = Favorite.remove(self.id, book_id)
+        if added_at:
+            self._favorites_changed()
+            Recommendation.favorite_changed_async(self.id, book_id, -1, added_at)
+    
+    def _favorites_changed(self):
+        # The version is part of page ETags, which render favorite hearts
+        mongo.db.users.update_one({'_id': ObjectId(self.id)}, {'$inc': {'version': 1}})
+        User.invalidate_cache(self.id)
+        self._favorites = None
+        self._favorite_set = None
     
     def get_favorites(self):
-        user_data = mongo.db.users.find_one({'_id': ObjectId(self.id)})
-        return user_data.get('favorites', [])
+        """Favorite book ids, newest first; loaded at most once per User object."""
+        if self._favorites is None:
+            self._favorites = Favorite.book_ids(self.id)
+        return self._favorites
+    
+    def get_favorite_set(self):
+        if self._favorite_set is None:
+            self._favorite_set = set(self.get_favorites())
+        return self._favorite_set
+    
+    def favorite_ids_among(self, book_ids):
+        """Which of ``book_ids`` are favorites, without loading the whole list."""
+        if self._favorite_set is not None:
+            return {str(book_id) for book_id in book_ids} & self._favorite_set
+        return Favorite.among(self.id, book_ids)
+    
+    def recommended_book_ids(self, limit, seeds=10):
+        """Books similar to the user's ``seeds`` most recent favorites that are not favorites yet."""
+        candidates = Recommendation.for_books(Favorite.book_ids(self.id, limit=seeds), limit=limit * 2)
+        favorites = self.favorite_ids_among(candidates)
+        return [book_id for book_id in candidates if book_id not in favorites][:limit]
     
     def is_favorite(self, book_id):
-        return str(book_id) in self.get_favorites()
+        if self._favorite_set is not None:
+            return str(book_id) in self._favorite_set
+        return Favorite.exists(self.id, book_id)
     
     def update_password(self, new_password):
-        password_hash = generate_password_hash(new_password)
+        password_hash = hash_password(new_password)
         mongo.db.users.update_one(
             {'_id': ObjectId(self.id)},
-            {'$set': {'password_hash': password_hash}}
+            {'$set': {'password_hash': password_hash}, '$inc': {'version': 1}}
         )
+        User.invalidate_cache(self.id)
         self.password_hash = password_hash
     
     def update_profile(self, username=None, email=None):
@@ -106,5 +288,6 @@ class User(UserMixin):
         if update_data:
             mongo.db.users.update_one(
                 {'_id': ObjectId(self.id)},
-                {'$set': update_data}
-            )
\ No newline at end of file
+                {'$set': update_data, '$inc': {'version': 1}}
+            )
+            User.invalidate_cache(self.id)
\ No newline at end of file
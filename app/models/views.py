@@ -0,0 +1,128 @@
+import atexit
+import math
+import os
+import threading
+from datetime import datetime
+from functools import wraps
+from flask import current_app, make_response
+from pymongo import UpdateOne
+from app import mongo
+from app.models.pagination import parse_cursor
+
+# Trending scores count time in hours from this instant
+TRENDING_EPOCH = datetime(2024, 1, 1)
+
+_lock = threading.Lock()
+_pending = {}
+_wake = threading.Event()
+_flusher = {'pid': None, 'interval': 5, 'buffer_limit': 10000, 'half_life': 24.0}
+
+
+class BookViews:
+    """Write-behind view counters and the trending score derived from them.
+
+    ``record`` only bumps a per-process dict. A daemon thread writes the
+    buffered counts every ``VIEW_FLUSH_INTERVAL`` seconds (sooner when
+    ``VIEW_BUFFER_LIMIT`` books are pending) as one unordered ``bulk_write``
+    with a single ``$inc``-style update per book, and once more when the
+    worker exits. Counts from a worker that is killed outright are lost,
+    which is acceptable for a popularity signal.
+
+    ``trending`` is ``log2(sum(2 ** (t / half_life)))`` over all views, with
+    ``t`` in hours since ``TRENDING_EPOCH``. Older views weigh
+    exponentially less, yet the stored value only ever grows, so the
+    ranking needs no periodic recomputation and sorts straight off an
+    index. Working in log2 keeps the number small however long the
+    catalog runs.
+    """
+
+    @staticmethod
+    def record(book_id):
+        book_id = parse_cursor(book_id)
+        if book_id is None:
+            return
+        if _flusher['pid'] != os.getpid():
+            BookViews._start(current_app.config)
+        with _lock:
+            _pending[book_id] = _pending.get(book_id, 0) + 1
+            full = len(_pending) >= _flusher['buffer_limit']
+        if full:
+            _wake.set()
+
+    @staticmethod
+    def counted(view):
+        """Record a view of ``book_id`` whenever the wrapped detail view answers 200 or 304."""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            response = make_response(view(*args, **kwargs))
+            if response.status_code in (200, 304):
+                BookViews.record(kwargs['book_id'])
+            return response
+        return wrapper
+
+    @staticmethod
+    def flush():
+        """Write the buffered counts; returns the number of books updated."""
+        global _pending
+        with _lock:
+            pending, _pending = _pending, {}
+        if not pending:
+            return 0
+        now = datetime.utcnow()
+        hours = (now - TRENDING_EPOCH).total_seconds() / 3600
+        ops = [
+            UpdateOne({'_id': book_id}, _view_update(views, hours / _flusher['half_life'], now))
+            for book_id, views in pending.items()
+        ]
+        try:
+            mongo.db.books.bulk_write(ops, ordered=False)
+        except Exception as e:
+            # Keep the counts for the next attempt
+            with _lock:
+                for book_id, views in pending.items():
+                    _pending[book_id] = _pending.get(book_id, 0) + views
+            print(f"⚠ Could not write views for {len(pending)} book(s) (will retry): {e}")
+            return 0
+        return len(ops)
+
+    @staticmethod
+    def pending():
+        with _lock:
+            return sum(_pending.values())
+
+    @staticmethod
+    def _start(config):
+        with _lock:
+            if _flusher['pid'] == os.getpid():
+                return
+            # Counts inherited from a forking parent belong to the parent
+            _pending.clear()
+            _flusher.update(
+                pid=os.getpid(),
+                interval=config['VIEW_FLUSH_INTERVAL'],
+                buffer_limit=config['VIEW_BUFFER_LIMIT'],
+                half_life=config['TRENDING_HALF_LIFE_HOURS']
+            )
+        threading.Thread(target=_run, name='view-flusher', daemon=True).start()
+        atexit.register(BookViews.flush)
+
+
+def _run():
+    while True:
+        _wake.wait(_flusher['interval'])
+        _wake.clear()
+        BookViews.flush()
+
+
+def _view_update(views, now_exponent, now):
+    # log2(2 ** trending + views * 2 ** now_exponent), computed without overflow
+    added = math.log2(views) + now_exponent
+    merged = {'$let': {
+        'vars': {'hi': {'$max': ['$trending', added]}, 'lo': {'$min': ['$trending', added]}},
+        'in': {'$add': ['$$hi', {'$log': [{'$add': [1, {'$pow': [2, {'$subtract': ['$$lo', '$$hi']}]}]}, 2]}]}
+    }}
+    return [{'$set': {
+        'views': {'$add': [{'$ifNull': ['$views', 0]}, views]},
+        'trending': {'$cond': [{'$isNumber': '$trending'}, merged, added]},
+        'viewed_at': now
+    }}]
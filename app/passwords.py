@@ -0,0 +1,62 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing queue is full or a hash times out; callers should answer 503."""
+
+
+_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+_slots = None
+
+
+def _get_executor():
+    global _executor, _executor_pid, _slots
+    # Pools do not survive a fork, so each worker process builds its own
+    if _executor is None or _executor_pid != os.getpid():
+        with _lock:
+            if _executor is None or _executor_pid != os.getpid():
+                config = current_app.config
+                _executor = ProcessPoolExecutor(max_workers=config['PASSWORD_HASH_WORKERS'])
+                _executor_pid = os.getpid()
+                _slots = threading.BoundedSemaphore(
+                    config['PASSWORD_HASH_WORKERS'] + config['PASSWORD_HASH_QUEUE_LIMIT']
+                )
+    return _executor
+
+
+def _run(func, *args):
+    if current_app.config['PASSWORD_HASH_WORKERS'] <= 0:
+        return func(*args)
+    executor = _get_executor()
+    if not _slots.acquire(blocking=False):
+        raise PasswordHasherBusy()
+    try:
+        future = executor.submit(func, *args)
+    except Exception:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    try:
+        return future.result(timeout=current_app.config['PASSWORD_HASH_TIMEOUT'])
+    except TimeoutError:
+        raise PasswordHasherBusy()
+
+
+def hash_password(password):
+    return _run(generate_password_hash, password, current_app.config['PASSWORD_HASH_METHOD'])
+
+
+def verify_password(password_hash, password):
+    return _run(check_password_hash, password_hash, password)
+
+
+def needs_rehash(password_hash):
+    """True when ``password_hash`` was made with other parameters than ``PASSWORD_HASH_METHOD``."""
+    method = password_hash.split('$', 1)[0]
+    return method != current_app.config['PASSWORD_HASH_METHOD']
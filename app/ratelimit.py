@@ -0,0 +1,183 @@
+import math
+import threading
+import time
+from flask import current_app, g, request
+from flask_login import current_user
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app import mongo
+from app.cache import TTLCache
+from app.metrics import throttled_requests
+
+
+class Rule:
+    """One entry of ``RATE_LIMITS`` or ``CONCURRENCY_LIMITS``.
+
+    Written as ``[METHOD ]target[?arg]=value``. ``target`` is an endpoint
+    (``books.search_books``) or a whole blueprint (``admin``); ``?arg``
+    restricts the rule to requests where that query or form argument is
+    not blank, e.g. ``books.book_list?search``.
+    """
+
+    def __init__(self, spec, value):
+        method, _, target = spec.strip().rpartition(' ')
+        target, _, self.arg = target.partition('?')
+        self.method = method.strip().upper() or None
+        self.target = target
+        self.value = value
+        self.key = spec.strip()
+
+    def matches(self):
+        if self.method and request.method != self.method:
+            return False
+        if self.arg and not request.values.get(self.arg, '').strip():
+            return False
+        return self.target in (request.endpoint, request.blueprint)
+
+
+def parse_rules(spec, parse_value):
+    rules = []
+    for item in (spec or '').split(','):
+        if item.strip():
+            key, _, value = item.rpartition('=')
+            rules.append(Rule(key, parse_value(value.strip())))
+    return rules
+
+
+def parse_rate(value):
+    """``"30/60"`` is 30 requests per 60 seconds, as ``(capacity, period)``."""
+    capacity, _, period = value.partition('/')
+    return int(capacity), float(period or 1)
+
+
+class MemoryBackend:
+    """Token buckets in this worker process; limits apply per worker."""
+
+    def __init__(self, max_keys):
+        self._buckets = TTLCache(maxsize=max_keys)
+        self._lock = threading.Lock()
+
+    def hit(self, key, capacity, period):
+        rate = capacity / period
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            # An idle bucket is full again after one period, so it can simply expire
+            self._buckets.set(key, (tokens, now), ttl=period)
+        return allowed, 0 if allowed else math.ceil((1 - tokens) / rate)
+
+
+class MongoBackend:
+    """Token buckets in the ``rate_limits`` collection, shared by every worker.
+
+    Each check is one atomic pipeline update that refills the bucket from
+    the database clock (``$$NOW``) and takes a token. Needs MongoDB 4.2+.
+    A TTL index removes idle buckets.
+    """
+
+    def __init__(self):
+        self._indexed = False
+
+    def hit(self, key, capacity, period):
+        if not self._indexed:
+            mongo.db.rate_limits.create_index('expires_at', expireAfterSeconds=0)
+            self._indexed = True
+        rate = capacity / period
+        elapsed = {'$divide': [{'$subtract': ['$$NOW', {'$ifNull': ['$updated_at', '$$NOW']}]}, 1000]}
+        pipeline = [
+            {'$set': {
+                'tokens': {'$min': [capacity, {'$add': [
+                    {'$ifNull': ['$tokens', capacity]}, {'$multiply': [{'$max': [elapsed, 0]}, rate]}
+                ]}]},
+                'updated_at': '$$NOW',
+                'expires_at': {'$add': ['$$NOW', int(period * 1000)]}
+            }},
+            {'$set': {
+                'allowed': {'$gte': ['$tokens', 1]},
+                'tokens': {'$cond': [{'$gte': ['$tokens', 1]}, {'$subtract': ['$tokens', 1]}, '$tokens']}
+            }}
+        ]
+        for attempt in range(2):
+            try:
+                bucket = mongo.db.rate_limits.find_one_and_update(
+                    {'_id': key}, pipeline, projection={'tokens': 1, 'allowed': 1},
+                    upsert=True, return_document=ReturnDocument.AFTER
+                )
+                break
+            except DuplicateKeyError:
+                # Two workers created the same bucket at once; the retry updates it
+                if attempt:
+                    raise
+        if bucket['allowed']:
+            return True, 0
+        return False, math.ceil((1 - bucket['tokens']) / rate)
+
+
+_state = {'rate_rules': [], 'concurrency_rules': [], 'slots': {}, 'backend': None}
+
+
+def init_app(app):
+    """Per-client rate limits and per-endpoint concurrency caps.
+
+    ``RATE_LIMITS`` gives each matching rule a token bucket per client: the
+    user id when logged in, the remote address otherwise. An empty bucket
+    answers ``429`` with ``Retry-After`` before the view runs.
+    ``CONCURRENCY_LIMITS`` caps how many requests a worker process runs at
+    once for an endpoint; excess requests get ``503`` immediately instead of
+    tying up threads that cheap catalog pages need. Rate limits are per
+    worker with the ``memory`` backend and shared with ``mongo``; if the
+    shared backend fails, requests are let through.
+    """
+    config = app.config
+    _state['rate_rules'] = parse_rules(config['RATE_LIMITS'], parse_rate)
+    _state['concurrency_rules'] = parse_rules(config['CONCURRENCY_LIMITS'], int)
+    _state['slots'] = {rule.key: threading.BoundedSemaphore(rule.value)
+                       for rule in _state['concurrency_rules']}
+    if config['RATE_LIMIT_BACKEND'] == 'mongo':
+        _state['backend'] = MongoBackend()
+    else:
+        _state['backend'] = MemoryBackend(config['RATE_LIMIT_MAX_KEYS'])
+
+    @app.before_request
+    def limit_request():
+        if not config['RATE_LIMIT_ENABLED']:
+            return None
+        for rule in _state['rate_rules']:
+            if rule.matches():
+                allowed, retry_after = _hit(rule)
+                if not allowed:
+                    throttled_requests.inc({'endpoint': request.endpoint, 'reason': 'rate'})
+                    return ({'error': 'Too many requests, please retry later'}, 429,
+                            {'Retry-After': str(retry_after)})
+
+        acquired = g.setdefault('concurrency_slots', [])
+        for rule in _state['concurrency_rules']:
+            if rule.matches():
+                slot = _state['slots'][rule.key]
+                if not slot.acquire(blocking=False):
+                    throttled_requests.inc({'endpoint': request.endpoint, 'reason': 'concurrency'})
+                    return {'error': 'Server busy, please retry shortly'}, 503, {'Retry-After': '1'}
+                acquired.append(slot)
+        return None
+
+    @app.teardown_request
+    def release_slots(exc):
+        for slot in g.pop('concurrency_slots', []):
+            slot.release()
+
+
+def _hit(rule):
+    capacity, period = rule.value
+    if current_user.is_authenticated:
+        client = f'user:{current_user.id}'
+    else:
+        client = f'ip:{request.remote_addr}'
+    try:
+        return _state['backend'].hit(f'{rule.key}|{client}', capacity, period)
+    except Exception as e:
+        current_app.logger.warning('Rate limit check failed, allowing request: %s', e)
+        return True, 0
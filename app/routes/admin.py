@@ -3,6 +3,8 @@ from flask_login import login_required, current_user
 from functools import wraps
 from app.models.book import Book
 from app.models.user import User
+from app.models.stats import Stats
+from app.http_cache import page_cache_stats
 
 bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -20,13 +22,12 @@ def admin_required(f):
 @admin_required
 def dashboard():
     # Get statistics
-    total_books = len(Book.get_all())
-    total_users = len(User.get_all())
-    recent_books = Book.get_all()[:5]  # Get 5 most recent books
+    library_stats = Stats.get()
+    recent_books = Book.paginate(per_page=5)['items']  # Get 5 most recent books
     
     stats = {
-        'total_books': total_books,
-        'total_users': total_users,
+        'total_books': library_stats['total_books'],
+        'total_users': library_stats['total_users'],
         'recent_books': recent_books
     }
     
@@ -36,15 +37,41 @@ def dashboard():
 @login_required
 @admin_required
 def manage_books():
-    books = Book.get_all()
-    return render_template('book_list.html', books=books)
+    filters = Book.build_filters(
+        genre=request.args.get('genre'),
+        author=request.args.get('author'),
+        decade=request.args.get('decade')
+    )
+    list_page = Book.list_page(request.args.get('sort'))
+    page = list_page(
+        filters=filters,
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        with_total=True
+    )
+    return render_template('book_list.html',
+                         books=page['items'],
+                         page=page,
+                         facets=Book.facets(filters),
+                         favorite_ids=current_user.favorite_ids_among(book.id for book in page['items']))
 
 @bp.route('/users')
 @login_required
 @admin_required
 def manage_users():
-    users = User.get_all()
-    return render_template('manage_users.html', users=users)
+    search = request.args.get('q')
+    filters = User.build_filters(
+        search=search,
+        role=request.args.get('role')
+    )
+    page = User.paginate(
+        filters=filters,
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        with_total=True,
+        order_by=User.search_field(search)
+    )
+    return render_template('manage_users.html', users=page['items'], page=page)
 
 @bp.route('/users/<user_id>/role', methods=['POST'])
 @login_required
@@ -99,26 +126,13 @@ def delete_user(user_id):
 @login_required
 @admin_required
 def api_stats():
-    books = Book.get_all()
-    users = User.get_all()
-    
-    # Genre distribution
-    genres = {}
-    for book in books:
-        genre = book.get('genre', 'Unknown')
-        genres[genre] = genres.get(genre, 0) + 1
-    
-    # User role distribution
-    roles = {'admin': 0, 'client': 0}
-    for user in users:
-        roles[user.role] = roles.get(user.role, 0) + 1
-    
-    return jsonify({
-        'total_books': len(books),
-        'total_users': len(users),
-        'genres': genres,
-        'user_roles': roles
-    })
+    return jsonify(Stats.get())
+
+@bp.route('/api/cache-stats')
+@login_required
+@admin_required
+def api_cache_stats():
+    return jsonify({'users': User.cache_stats(), 'books': Book.cache_stats(), 'pages': page_cache_stats()})
 
 @bp.route('/profile')
 @login_required
@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from flask_login import login_user, logout_user, login_required, current_user
 from app.models.user import User
+from app.passwords import PasswordHasherBusy
 
 bp = Blueprint('auth', __name__, url_prefix='/auth')
 
@@ -17,7 +18,14 @@ def login():
         
         user = User.get_by_username(username)
         
-        if user and user.check_password(password):
+        try:
+            authenticated = user is not None and user.check_password(password)
+        except PasswordHasherBusy:
+            flash('The server is busy, please try again in a moment', 'error')
+            return render_template('login.html'), 503, {'Retry-After': '1'}
+        
+        if authenticated:
+            user.rehash_password_if_needed(password)
             login_user(user)
             flash('Login successful!', 'success')
             
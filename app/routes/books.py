@@ -1,32 +1,72 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify
 from flask_login import current_user
 from app.models.book import Book
-import os
-from werkzeug.utils import secure_filename
+from app.models.recommendation import Recommendation
+from app.models.views import BookViews
+from app.suggest import suggest_index
+from app.images import process_cover_async
+from app.storage import store_upload, release_upload
+from app.http_cache import conditional_page
 
 bp = Blueprint('books', __name__)
 
 @bp.route('/')
+@conditional_page(lambda: ('index', None))
 def index():
     return render_template('index.html')
 
+def _list_version():
+    # Favorites and views reorder these sorts without bumping the catalog version
+    if request.args.get('sort') in ('popular', 'trending'):
+        return None, None
+    return Book.collection_version()
+
 @bp.route('/books')
+@conditional_page(_list_version)
 def book_list():
     search_query = request.args.get('search', '')
     genre_filter = request.args.get('genre', '')
     
+    filters = Book.build_filters(
+        genre=genre_filter,
+        author=request.args.get('author'),
+        decade=request.args.get('decade')
+    )
     if search_query:
-        books = Book.search(search_query)
+        page = Book.search_page(
+            search_query,
+            filters=filters,
+            after=request.args.get('after'),
+            before=request.args.get('before')
+        )
     else:
-        books = Book.get_all()
-    
-    # Filter by genre if specified
-    if genre_filter:
-        books = [book for book in books if book.get('genre', '').lower() == genre_filter.lower()]
+        list_page = Book.list_page(request.args.get('sort'))
+        page = list_page(
+            filters=filters,
+            after=request.args.get('after'),
+            before=request.args.get('before'),
+            with_total=True
+        )
+    books = page['items']
     
-    return render_template('book_list.html', books=books)
+    favorite_ids = set()
+    if current_user.is_authenticated:
+        favorite_ids = current_user.favorite_ids_among(book.id for book in books)
+    return render_template('book_list.html',
+                         books=books,
+                         page=page,
+                         facets=Book.facets(filters),
+                         favorite_ids=favorite_ids)
+
+def _detail_version(book_id):
+    version, updated_at = Book.get_version(book_id)
+    if version is None:
+        return None, None
+    return f'{version}/{Recommendation.stamp(book_id)}', updated_at
 
 @bp.route('/books/<book_id>')
+@BookViews.counted
+@conditional_page(_detail_version)
 def book_detail(book_id):
     book = Book.get_by_id(book_id)
     if not book:
@@ -37,17 +77,17 @@ def book_detail(book_id):
     if current_user.is_authenticated:
         is_favorite = current_user.is_favorite(book_id)
     
-    return render_template('book_detail.html', book=book, is_favorite=is_favorite)
+    similar_books = Book.get_many(Recommendation.similar_ids(book_id, current_app.config['RECOMMENDATIONS_SHOWN']))
+    return render_template('book_detail.html', book=book, is_favorite=is_favorite, similar_books=similar_books)
 
 @bp.route('/books/add', methods=['GET', 'POST'])
 def add_book():
     if request.method == 'POST':
-        image_filename = None
+        image_filename = image_digest = None
         if 'image' in request.files and request.files['image'].filename:
             file = request.files['image']
             if file.filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif')):
-                image_filename = secure_filename(file.filename)
-                file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], image_filename))
+                image_filename, image_digest = store_upload(file, current_app.config['UPLOAD_FOLDER'])
         
         data = {
             'title': request.form['title'],
@@ -55,9 +95,17 @@ def add_book():
             'genre': request.form['genre'],
             'year': int(request.form['year']),
             'description': request.form['description'],
-            'image': image_filename
+            'image': image_filename,
+            'image_digest': image_digest
         }
-        Book.create(data)
+        try:
+            result = Book.create(data)
+        finally:
+            if image_digest:
+                # The book holds its own reference now, or none if saving failed
+                release_upload(image_digest, current_app.config['UPLOAD_FOLDER'])
+        if image_filename:
+            process_cover_async(result.inserted_id, image_filename)
         flash('Book added successfully', 'success')
         return redirect(url_for('books.book_list'))
     return render_template('add_edit_book.html', book=None, action='Add')
@@ -70,11 +118,15 @@ def edit_book(book_id):
         return redirect(url_for('books.book_list'))
     if request.method == 'POST':
         image_filename = book.get('image')
+        image_digest = book.get('image_digest')
+        uploaded = False
+        stored_digest = None
         if 'image' in request.files and request.files['image'].filename:
             file = request.files['image']
             if file.filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif')):
-                image_filename = secure_filename(file.filename)
-                file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], image_filename))
+                image_filename, image_digest = store_upload(file, current_app.config['UPLOAD_FOLDER'])
+                stored_digest = image_digest
+                uploaded = image_filename != book.get('image')
         
         data = {
             'title': request.form['title'],
@@ -82,9 +134,18 @@ def edit_book(book_id):
             'genre': request.form['genre'],
             'year': int(request.form['year']),
             'description': request.form['description'],
-            'image': image_filename
+            'image': image_filename,
+            'image_digest': image_digest
         }
-        Book.update(book_id, data)
+        if uploaded:
+            data['image_variants'] = None
+        try:
+            Book.update(book_id, data)
+        finally:
+            if stored_digest:
+                release_upload(stored_digest, current_app.config['UPLOAD_FOLDER'])
+        if uploaded:
+            process_cover_async(book_id, image_filename)
         flash('Book updated successfully', 'success')
         return redirect(url_for('books.book_detail', book_id=book_id))
     return render_template('add_edit_book.html', book=book, action='Edit')
@@ -101,4 +162,20 @@ def search_books():
         query = request.form['query']
         books = Book.search(query)
         return render_template('search.html', books=books, query=query)
-    return render_template('search.html', books=None, query='')
\ No newline at end of file
+    return render_template('search.html', books=None, query='')
+
+@bp.route('/search/suggest')
+def suggest():
+    query = request.args.get('q', '')
+    limit = max(1, min(request.args.get('limit', current_app.config['SUGGEST_LIMIT'], type=int), 20))
+    
+    # Other workers' writes only reach this index through a periodic rebuild.
+    # A cold worker builds it once in the background and suggests nothing until then
+    if suggest_index.is_stale(current_app.config['SUGGEST_REBUILD_INTERVAL']):
+        suggest_index.refresh_in_background(Book.load_suggest_entries)
+    
+    suggestions = suggest_index.suggest(query, limit) if suggest_index.ready else []
+    for item in suggestions:
+        if item['book_id']:
+            item['url'] = url_for('books.book_detail', book_id=item['book_id'])
+    return jsonify({'query': query, 'suggestions': suggestions})
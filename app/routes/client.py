@@ -1,6 +1,8 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
 from flask_login import login_required, current_user
 from app.models.book import Book
+from app.models.recommendation import Recommendation
+from app.models.views import BookViews
 
 bp = Blueprint('client', __name__, url_prefix='/client')
 
@@ -8,44 +10,59 @@ bp = Blueprint('client', __name__, url_prefix='/client')
 @login_required
 def dashboard():
     # Get user's favorite books or recent activity
-    recent_books = Book.get_all()[:6]  # Show 6 recent books
-    return render_template('client_dashboard.html', books=recent_books)
+    recent_books = Book.paginate(per_page=6)['items']  # Show 6 recent books
+    recommended = Book.get_many(current_user.recommended_book_ids(current_app.config['RECOMMENDATIONS_SHOWN']))
+    trending = Book.trending_page(filters={'trending': {'$type': 'number'}}, per_page=6)['items']
+    return render_template('client_dashboard.html', books=recent_books, recommended_books=recommended,
+                         trending_books=trending)
 
 @bp.route('/books')
 @login_required
 def browse_books():
-    page = request.args.get('page', 1, type=int)
     search_query = request.args.get('search', '')
     genre_filter = request.args.get('genre', '')
     
+    filters = Book.build_filters(
+        genre=genre_filter,
+        author=request.args.get('author'),
+        decade=request.args.get('decade')
+    )
     if search_query:
-        books = Book.search(search_query)
+        page = Book.search_page(
+            search_query,
+            filters=filters,
+            after=request.args.get('after'),
+            before=request.args.get('before')
+        )
     else:
-        books = Book.get_all()
-    
-    # Filter by genre if specified
-    if genre_filter:
-        books = [book for book in books if book.get('genre', '').lower() == genre_filter.lower()]
-    
-    # Get unique genres for filter dropdown
-    all_books = Book.get_all()
-    genres = list(set(book.get('genre', '') for book in all_books if book.get('genre')))
-    genres.sort()
+        list_page = Book.list_page(request.args.get('sort'))
+        page = list_page(
+            filters=filters,
+            after=request.args.get('after'),
+            before=request.args.get('before'),
+            with_total=True
+        )
+    books = page['items']
     
     return render_template('book_list.html', 
                          books=books, 
-                         genres=genres,
+                         page=page,
+                         favorite_ids=current_user.favorite_ids_among(book.id for book in books),
+                         facets=Book.facets(filters),
                          current_search=search_query,
                          current_genre=genre_filter)
 
 @bp.route('/books/<book_id>')
 @login_required
+@BookViews.counted
 def book_detail(book_id):
     book = Book.get_by_id(book_id)
     if not book:
         flash('Book not found', 'error')
         return redirect(url_for('client.browse_books'))
-    return render_template('book_detail.html', book=book, is_favorite=current_user.is_favorite(book_id) if current_user.is_authenticated else False)
+    similar_books = Book.get_many(Recommendation.similar_ids(book_id, current_app.config['RECOMMENDATIONS_SHOWN']))
+    return render_template('book_detail.html', book=book, similar_books=similar_books,
+                         is_favorite=current_user.is_favorite(book_id) if current_user.is_authenticated else False)
 
 @bp.route('/profile')
 @login_required
@@ -55,12 +72,6 @@ def profile():
 @bp.route('/favorites')
 @login_required
 def favorites():
-    favorite_ids = current_user.get_favorites()
-    favorite_books = []
-    
-    for book_id in favorite_ids:
-        book = Book.get_by_id(book_id)
-        if book:
-            favorite_books.append(book)
+    favorite_books = Book.get_many(current_user.get_favorites())
     
     return render_template('client_favorites.html', books=favorite_books)
\ No newline at end of file
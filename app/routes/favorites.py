@@ -56,12 +56,6 @@ def toggle_favorite(book_id):
 @bp.route('/list')
 @login_required
 def list_favorites():
-    favorite_ids = current_user.get_favorites()
-    favorite_books = []
-    
-    for book_id in favorite_ids:
-        book = Book.get_by_id(book_id)
-        if book:
-            favorite_books.append(book)
+    favorite_books = Book.get_many(current_user.get_favorites())
     
     return render_template('favorites_list.html', books=favorite_books)
\ No newline at end of file
@@ -49,16 +49,76 @@ document.querySelectorAll('.alert').forEach(alert => {
     }, 5000);
 });
 
-// Add search functionality enhancement
-const searchInput = document.querySelector('input[name="query"]');
-if (searchInput) {
-    searchInput.addEventListener('input', function() {
-        if (this.value.length > 2) {
-            // Add search suggestions or live search here
-            console.log('Searching for:', this.value);
+// Search suggestions (debounced typeahead)
+document.querySelectorAll('input[data-suggest-url]').forEach(input => {
+    const list = document.createElement('ul');
+    list.className = 'list-group suggest-list';
+    list.hidden = true;
+    input.parentNode.classList.add('position-relative');
+    input.parentNode.appendChild(list);
+
+    let timer = null;
+    let controller = null;
+
+    const hide = () => {
+        list.hidden = true;
+        list.innerHTML = '';
+    };
+
+    const render = (suggestions) => {
+        list.innerHTML = '';
+        suggestions.forEach(item => {
+            const li = document.createElement('li');
+            li.className = 'list-group-item list-group-item-action suggest-item';
+            const icon = document.createElement('i');
+            icon.className = item.type === 'author' ? 'fas fa-user-edit me-2 text-muted' : 'fas fa-book me-2 text-muted';
+            li.appendChild(icon);
+            li.appendChild(document.createTextNode(item.label));
+            li.addEventListener('mousedown', (e) => {
+                e.preventDefault();
+                if (item.url) {
+                    window.location.href = item.url;
+                } else {
+                    input.value = item.label;
+                    hide();
+                    input.form.submit();
+                }
+            });
+            list.appendChild(li);
+        });
+        list.hidden = suggestions.length === 0;
+    };
+
+    input.addEventListener('input', function() {
+        clearTimeout(timer);
+        const query = this.value.trim();
+        if (query.length < 2) {
+            hide();
+            return;
         }
+        timer = setTimeout(() => {
+            if (controller) {
+                controller.abort();
+            }
+            controller = new AbortController();
+            fetch(`${input.dataset.suggestUrl}?q=${encodeURIComponent(query)}`, { signal: controller.signal })
+                .then(response => response.json())
+                .then(data => render(data.suggestions))
+                .catch(err => {
+                    if (err.name !== 'AbortError') {
+                        hide();
+                    }
+                });
+        }, 150);
     });
-}
+
+    input.addEventListener('blur', hide);
+    input.addEventListener('keydown', (e) => {
+        if (e.key === 'Escape') {
+            hide();
+        }
+    });
+});
 
 // Favorite button animation
 document.querySelectorAll('button[data-favorite]').forEach(btn => {
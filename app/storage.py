@@ -0,0 +1,62 @@
+import glob
+import hashlib
+import os
+import re
+import tempfile
+from app.models.upload import Upload
+
+CHUNK_SIZE = 64 * 1024
+CAS_DIR = 'cas'
+_DIGEST_RE = re.compile(r'[0-9a-f]{64}')
+
+
+def store_upload(file, upload_folder):
+    """Stream an uploaded file to disk under its SHA-256 digest.
+
+    Returns ``(path, digest)`` with ``path`` relative to ``upload_folder``.
+    Identical content is stored once. The returned file holds one reference
+    for the caller, so a concurrent ``release_upload`` cannot delete it;
+    ``Book.create``/``Book.update`` take their own, so call
+    ``release_upload`` once the book is saved or saving failed.
+    """
+    ext = os.path.splitext(file.filename or '')[1].lower()
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=upload_folder, prefix='.upload-')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            for chunk in iter(lambda: file.stream.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                out.write(chunk)
+        digest = digest.hexdigest()
+
+        path = Upload.acquire(digest, f'{CAS_DIR}/{digest[:2]}/{digest}{ext}')
+        try:
+            target = os.path.join(upload_folder, path)
+            if not os.path.exists(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(tmp_path, target)
+                tmp_path = None
+        except Exception:
+            release_upload(digest, upload_folder)
+            raise
+        return path, digest
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def release_upload(digest, upload_folder):
+    """Drop a book's reference to ``digest`` and delete the files once unused."""
+    path = Upload.release(digest)
+    if not path:
+        return False
+    for stale in [os.path.join(upload_folder, path)] + glob.glob(
+            os.path.join(upload_folder, 'variants', f'{digest}-*')):
+        if os.path.exists(stale):
+            os.remove(stale)
+    return True
+
+
+def is_content_addressed(path):
+    """Content-addressed files never change, so they can be cached forever."""
+    return bool(_DIGEST_RE.search(path))
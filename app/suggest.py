@@ -0,0 +1,138 @@
+import bisect
+import threading
+import time
+import unicodedata
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', str(text or ''))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(text.lower().split())
+
+
+class SuggestIndex:
+    """Sorted-array prefix index over book titles and authors.
+
+    Entries are ``(key, kind, label, book_id)`` tuples kept in key order, so a
+    lookup is one bisect plus a short forward scan. Every word boundary of a
+    title or author gets its own key, which lets "potter" find
+    "Harry Potter".
+    """
+
+    def __init__(self):
+        self._entries = []
+        self._books = {}
+        self._authors = {}
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self.built_at = None
+
+    @property
+    def ready(self):
+        return self.built_at is not None
+
+    def is_stale(self, max_age):
+        return not self.ready or time.monotonic() - self.built_at > max_age
+
+    def build(self, books):
+        entries, book_map, authors = [], {}, {}
+        for book in books:
+            book_id = str(book['_id'])
+            title, author = book.get('title') or '', book.get('author') or ''
+            book_map[book_id] = (title, author)
+            entries.extend(self._keys(title, 'title', book_id))
+            if author:
+                count = authors.get(author, 0)
+                if not count:
+                    entries.extend(self._keys(author, 'author', None))
+                authors[author] = count + 1
+        entries.sort()
+        with self._lock:
+            self._entries, self._books, self._authors = entries, book_map, authors
+            self.built_at = time.monotonic()
+
+    def refresh_in_background(self, load_books):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.build(load_books())
+            except Exception as e:
+                print(f"⚠ Suggest index refresh failed: {e}")
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def add_book(self, book):
+        self.update_book(book['_id'], book)
+
+    def update_book(self, book_id, data):
+        book_id = str(book_id)
+        with self._lock:
+            title, author = self._books.get(book_id, ('', ''))
+            title = data.get('title', title) or ''
+            author = data.get('author', author) or ''
+            self._remove(book_id)
+            self._books[book_id] = (title, author)
+            for entry in self._keys(title, 'title', book_id):
+                bisect.insort(self._entries, entry)
+            if author:
+                if not self._authors.get(author):
+                    for entry in self._keys(author, 'author', None):
+                        bisect.insort(self._entries, entry)
+                self._authors[author] = self._authors.get(author, 0) + 1
+
+    def remove_book(self, book_id):
+        with self._lock:
+            self._remove(str(book_id))
+
+    def suggest(self, prefix, limit=8):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        results, seen = [], set()
+        with self._lock:
+            entries = self._entries
+            i = bisect.bisect_left(entries, (prefix,))
+            while i < len(entries) and len(results) < limit:
+                key, kind, label, book_id = entries[i]
+                if not key.startswith(prefix):
+                    break
+                if (kind, label, book_id) not in seen:
+                    seen.add((kind, label, book_id))
+                    results.append({'type': kind, 'label': label, 'book_id': book_id})
+                i += 1
+        return results
+
+    def _remove(self, book_id):
+        old = self._books.pop(book_id, None)
+        if old is None:
+            return
+        title, author = old
+        for entry in self._keys(title, 'title', book_id):
+            self._discard(entry)
+        if author:
+            count = self._authors.get(author, 0) - 1
+            if count > 0:
+                self._authors[author] = count
+            else:
+                self._authors.pop(author, None)
+                for entry in self._keys(author, 'author', None):
+                    self._discard(entry)
+
+    def _discard(self, entry):
+        i = bisect.bisect_left(self._entries, entry)
+        if i < len(self._entries) and self._entries[i] == entry:
+            del self._entries[i]
+
+    @staticmethod
+    def _keys(text, kind, book_id):
+        words = normalize(text).split()
+        return {(' '.join(words[i:]), kind, text, book_id) for i in range(len(words))}
+
+
+suggest_index = SuggestIndex()
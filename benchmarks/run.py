@@ -0,0 +1,264 @@
+"""Benchmark the main routes of the app against a seeded database.
+
+    python -m benchmarks.run --size small --output benchmarks/results/baseline.json
+    python -m benchmarks.run --size small --compare benchmarks/results/baseline.json
+
+Requests go through the Flask test client, so the numbers cover the
+application and MongoDB but not the WSGI server or the network.
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from random import Random
+
+SIZES = {'small': 1000, 'medium': 100000, 'large': 1000000}
+DEFAULT_URI = 'mongodb://localhost:27017/book_library_bench'
+SERVER_TIMING = re.compile(r'db;dur=([\d.]+);desc="(\d+) commands"')
+
+
+def build_scenarios(seed, count):
+    """``{name: (role, [(method, path, form), ...])}``; the same seed gives the same requests."""
+    from benchmarks.seed import GENRES, sample_book_ids, sample_words
+    rng = Random(seed)
+    words = sample_words(count, seed)
+    book_ids = sample_book_ids(count, seed)
+    decades = [str(d) for d in range(1850, 2030, 10)]
+    return {
+        'books': ('anonymous', [('GET', '/books', None)] * count),
+        'books_filtered': ('anonymous', [
+            ('GET', f'/books?genre={rng.choice(GENRES)}&decade={rng.choice(decades)}', None)
+            for _ in range(count)
+        ]),
+        'book_detail': ('anonymous', [('GET', f'/books/{book_id}', None) for book_id in book_ids]),
+        'search': ('anonymous', [('POST', '/search', {'query': word}) for word in words]),
+        'client_books': ('client', [('GET', f'/client/books?genre={rng.choice(GENRES)}', None)
+                                    for _ in range(count)]),
+        'client_favorites': ('client', [('GET', '/client/favorites', None)] * count),
+        'admin_dashboard': ('admin', [('GET', '/admin/dashboard', None)] * count),
+        'admin_stats': ('admin', [('GET', '/admin/api/stats', None)] * count),
+        'admin_users': ('admin', [('GET', f'/admin/users?q=user{rng.randint(1, 99)}', None)
+                                  for _ in range(count)])
+    }
+
+
+def create_bench_app(uri, in_process):
+    """Create the app against ``uri``, or against mongomock with ``in_process``."""
+    if in_process:
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit('--in-process needs mongomock (pip install mongomock)')
+        # Nothing listens here; the client is replaced right after startup
+        os.environ['MONGO_URI'] = 'mongodb://localhost:1/book_library_bench?serverSelectionTimeoutMS=100'
+    else:
+        os.environ['MONGO_URI'] = uri
+
+    from app import create_app, mongo
+    app = create_app()
+    if in_process:
+        mongo.cx = mongomock.MongoClient()
+        mongo.db = mongo.cx.book_library_bench
+        # mongomock has no projection expressions; BookSummary trims the description itself
+        from app.models.book import Book
+        Book.SUMMARY_PROJECTION = dict(Book.SUMMARY_PROJECTION, description=1)
+    return app
+
+
+class Runner:
+    def __init__(self, app, user_ids, concurrency, count_db=True):
+        self.app = app
+        self.user_ids = user_ids
+        self.concurrency = concurrency
+        self.count_db = count_db
+        self._local = threading.local()
+
+    def _client(self, role):
+        # One client per thread and role, so cookies are not shared between threads
+        clients = self._local.__dict__.setdefault('clients', {})
+        if role not in clients:
+            client = self.app.test_client()
+            if role in self.user_ids:
+                with client.session_transaction() as session:
+                    session['_user_id'] = self.user_ids[role]
+                    session['_fresh'] = True
+            clients[role] = client
+        return clients[role]
+
+    def request(self, role, method, path, form):
+        client = self._client(role)
+        started = time.perf_counter()
+        response = client.open(path, method=method, data=form)
+        elapsed = time.perf_counter() - started
+        match = self.count_db and SERVER_TIMING.search(response.headers.get('Server-Timing', ''))
+        response.close()
+        return {
+            'elapsed': elapsed,
+            'ok': response.status_code < 400,
+            'db_commands': int(match.group(2)) if match else None,
+            'db_time': float(match.group(1)) / 1000 if match else None
+        }
+
+    def run(self, role, requests, warmup):
+        for method, path, form in requests[:warmup]:
+            self.request(role, method, path, form)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            samples = list(pool.map(lambda r: self.request(role, *r), requests[warmup:]))
+        wall = time.perf_counter() - started
+        return summarize(samples, wall)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples, wall):
+    latencies = sorted(s['elapsed'] * 1000 for s in samples)
+    db_commands = [s['db_commands'] for s in samples if s['db_commands'] is not None]
+    db_time = [s['db_time'] * 1000 for s in samples if s['db_time'] is not None]
+    return {
+        'requests': len(samples),
+        'errors': sum(not s['ok'] for s in samples),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'throughput_rps': round(len(samples) / wall, 1) if wall else None,
+        'db_commands_per_request': round(sum(db_commands) / len(db_commands), 2) if db_commands else None,
+        'db_ms_per_request': round(sum(db_time) / len(db_time), 3) if db_time else None
+    }
+
+
+def compare(results, baseline, threshold):
+    """Print the change per scenario and return the names that got slower than ``threshold``."""
+    regressions = []
+    if baseline.get('params') != results['params'] or baseline.get('backend') != results['backend']:
+        print("⚠ Baseline was recorded with different parameters; the comparison is not like for like")
+    print(f"\n{'scenario':<18} {'p50':>10} {'p95':>10} {'p99':>10} {'db cmds':>10}")
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous or 'p50_ms' not in previous or 'p50_ms' not in current:
+            continue
+        cells = []
+        for key in ('p50_ms', 'p95_ms', 'p99_ms', 'db_commands_per_request'):
+            old, new = previous.get(key), current.get(key)
+            if old is None or new is None:
+                cells.append(f"{'-':>10}")
+                continue
+            change = (new - old) / old if old else 0.0
+            cells.append(f'{change:>+10.0%}')
+            if key in ('p95_ms', 'db_commands_per_request') and change > threshold:
+                regressions.append(name)
+        print(f'{name:<18} ' + ' '.join(cells))
+    return sorted(set(regressions))
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', choices=SIZES, default='small', help='Catalog size preset (1k/100k/1M books).')
+    parser.add_argument('--books', type=int, help='Exact number of books; overrides --size.')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--favorites', type=int, default=500, help='Favorites of the bench client user.')
+    parser.add_argument('--requests', type=int, default=200, help='Measured requests per scenario.')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--scenario', action='append', help='Run only these scenarios (repeatable).')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reseed', action='store_true', help='Reseed even if the data matches.')
+    parser.add_argument('--no-page-cache', action='store_true', help='Render every anonymous page.')
+    parser.add_argument('--mongo-uri', default=os.getenv('BENCH_MONGO_URI', DEFAULT_URI))
+    parser.add_argument('--in-process', action='store_true', help='Use mongomock instead of MongoDB.')
+    parser.add_argument('--output', help='Write results as JSON to this file.')
+    parser.add_argument('--compare', help='Baseline JSON to compare against.')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Relative p95 / DB command increase that counts as a regression.')
+    args = parser.parse_args(argv)
+
+    books = args.books if args.books is not None else SIZES[args.size]
+    app = create_bench_app(args.mongo_uri, args.in_process)
+    if args.no_page_cache:
+        app.config['PAGE_CACHE_TTL'] = 0
+    # Every benchmark request comes from one client and would soon be throttled
+    app.config['RATE_LIMIT_ENABLED'] = False
+
+    from app.models.book import Book
+    from benchmarks.seed import seed
+    with app.app_context():
+        started = time.perf_counter()
+        user_ids = seed(books, args.users, args.favorites, seed=args.seed, force=args.reseed)
+        Book.rebuild_suggest_index()
+        print(f"✓ Data ready in {time.perf_counter() - started:.1f}s "
+              f"({books} books, {args.users} users, {args.favorites} favorites)")
+        scenarios = build_scenarios(args.seed, args.requests + args.warmup)
+
+    if args.in_process and args.concurrency > 1:
+        # mongomock is not thread-safe
+        print("⚠ --in-process runs with concurrency 1; DB commands are not counted")
+        args.concurrency = 1
+    runner = Runner(app, user_ids, args.concurrency, count_db=not args.in_process)
+    results = {
+        'commit': git_commit(),
+        'timestamp': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'python': platform.python_version(),
+        'backend': 'mongomock' if args.in_process else 'mongodb',
+        'params': {
+            'books': books, 'users': args.users, 'favorites': args.favorites,
+            'requests': args.requests, 'warmup': args.warmup, 'concurrency': args.concurrency,
+            'seed': args.seed, 'page_cache': not args.no_page_cache
+        },
+        'scenarios': {}
+    }
+
+    print(f"\n{'scenario':<18} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'db cmds':>8} {'errors':>7}")
+    for name, (role, requests) in scenarios.items():
+        if args.scenario and name not in args.scenario:
+            continue
+        if name == 'search' and args.in_process:
+            # mongomock has no $text support
+            results['scenarios'][name] = {'skipped': 'no text search in mongomock'}
+            continue
+        if not requests:
+            continue
+        summary = runner.run(role, requests, args.warmup)
+        results['scenarios'][name] = summary
+        db = summary['db_commands_per_request']
+        print(f"{name:<18} {summary['p50_ms']:>8.2f} {summary['p95_ms']:>8.2f} {summary['p99_ms']:>8.2f} "
+              f"{summary['throughput_rps']:>8.1f} {'-' if db is None else db:>8} {summary['errors']:>7}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"\n✓ Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n⚠ Regressions over {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""Deterministic catalog and user data for the benchmarks."""
+import random
+from datetime import datetime
+from app import mongo
+from app.models.book import Book
+from app.models.favorite import Favorite
+from app.models.recommendation import Recommendation
+from app.models.stats import Stats
+
+GENRES = ['Fiction', 'Fantasy', 'Mystery', 'Science Fiction', 'Romance', 'History',
+          'Biography', 'Poetry', 'Horror', 'Philosophy', 'Travel', 'Children']
+WORDS = ('river shadow garden winter silver empire letter stone journey night '
+         'ocean house memory city fire mountain secret glass voice storm forest '
+         'kingdom island machine harvest lantern orchard signal bridge atlas').split()
+SEED_ID = 'bench_seed'
+BATCH_SIZE = 10000
+
+BENCH_USERS = {
+    'client': 'bench_client',
+    'admin': 'bench_admin'
+}
+
+
+def _book(rng, i):
+    return {
+        'title': ' '.join(rng.choice(WORDS).capitalize() for _ in range(rng.randint(1, 4))),
+        'author': f'Author {rng.randint(1, 5000)}',
+        'genre': rng.choice(GENRES),
+        'year': rng.randint(1850, 2024),
+        'description': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(20, 60))),
+        'image': None,
+        'version': 1,
+        'updated_at': datetime.utcnow()
+    }
+
+
+def seed(books, users, favorites, seed=42, force=False):
+    """Fill the current database with ``books`` books and ``users`` users.
+
+    The bench client user gets ``favorites`` favorites. Seeding is skipped
+    when the database already holds data from the same parameters, so
+    repeated runs against a real MongoDB only pay for it once.
+    Returns the ids of the bench users by role.
+    """
+    params = {'books': books, 'users': users, 'favorites': favorites, 'seed': seed}
+    marker = mongo.db.counters.find_one({'_id': SEED_ID})
+    if marker and marker.get('params') == params and not force:
+        return marker['users']
+    if marker is None and mongo.db.books.estimated_document_count():
+        raise SystemExit(f"{mongo.db.name} holds books that were not seeded by the benchmarks; "
+                         "point --mongo-uri at a dedicated database")
+
+    for name in ('books', 'users', 'favorites', 'book_pairs', 'recommendations', 'stats', 'counters'):
+        mongo.db[name].delete_many({})
+    rng = random.Random(seed)
+
+    book_ids = []
+    for start in range(0, books, BATCH_SIZE):
+        batch = [_book(rng, i) for i in range(start, min(start + BATCH_SIZE, books))]
+        book_ids.extend(mongo.db.books.insert_many(batch, ordered=False).inserted_ids)
+
+    roles = ['client'] * 9 + ['admin']
+    for start in range(0, users, BATCH_SIZE):
+        mongo.db.users.insert_many([{
+            'username': f'user{i}',
+            'email': f'user{i}@bench.local',
+            'password_hash': '!',
+            'role': rng.choice(roles),
+            'is_active': True
+        } for i in range(start, min(start + BATCH_SIZE, users))], ordered=False)
+
+    bench_users = {}
+    for role, username in BENCH_USERS.items():
+        user = {'username': username, 'email': f'{username}@bench.local',
+                'password_hash': '!', 'role': role, 'is_active': True}
+        user_id = mongo.db.users.insert_one(user).inserted_id
+        if role == 'client':
+            picks = rng.sample(book_ids, min(favorites, len(book_ids)))
+            now = datetime.utcnow()
+            for start in range(0, len(picks), BATCH_SIZE):
+                mongo.db.favorites.insert_many([
+                    {'user_id': user_id, 'book_id': book_id, 'created_at': now}
+                    for book_id in picks[start:start + BATCH_SIZE]
+                ], ordered=False)
+        bench_users[role] = str(user_id)
+
+    try:
+        Book.ensure_indexes()
+        Favorite.ensure_indexes()
+        Recommendation.ensure_indexes()
+    except Exception as e:
+        print(f"⚠ Could not create indexes: {e}")
+    Favorite.recount()
+    Recommendation.rebuild()
+    Book._touch_collection()
+    Stats.recompute()
+    mongo.db.counters.replace_one(
+        {'_id': SEED_ID}, {'params': params, 'users': bench_users}, upsert=True
+    )
+    return bench_users
+
+
+def sample_words(count, seed=42):
+    rng = random.Random(seed)
+    return [rng.choice(WORDS) for _ in range(count)]
+
+
+def sample_book_ids(count, seed=42):
+    """Random existing book ids, for detail-page scenarios."""
+    rng = random.Random(seed)
+    ids = [str(doc['_id']) for doc in mongo.db.books.find({}, {'_id': 1}).limit(10000)]
+    return [rng.choice(ids) for _ in range(count)] if ids else []
+
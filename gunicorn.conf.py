@@ -0,0 +1,47 @@
+"""Gunicorn settings; every value can be overridden through the environment.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Reload workers gracefully with ``kill -HUP <master pid>``. Because the app
+is preloaded, picking up new code needs a new master: send ``USR2`` to
+start one next to the old master, then ``TERM`` the old one.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5001')}"
+
+# Default to one worker per core (plus one); containers should set
+# WEB_CONCURRENCY to the CPUs they are actually granted.
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+
+# Import the app and its modules once in the master, then fork
+preload_app = True
+
+# Kill a worker whose request has been stuck for this long
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers now and then to contain slow leaks
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+accesslog = '-'
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    # MongoClient is not fork-safe: give each worker its own connection pool
+    # instead of the one the preloaded master created.
+    from app import init_mongo
+    from wsgi import app
+    init_mongo(app)
+
+
+def worker_exit(server, worker):
+    # Write view counts still buffered in this worker
+    from app.models.views import BookViews
+    BookViews.flush()
@@ -0,0 +1,31 @@
+import os
+
+import mongomock
+import pytest
+
+# Nothing listens here; the client is replaced with mongomock below
+os.environ['MONGO_URI'] = 'mongodb://localhost:1/book_library_test?serverSelectionTimeoutMS=100'
+
+from app import create_app, health, http_cache, mongo
+from app.models.book import Book
+
+
+@pytest.fixture
+def app(monkeypatch):
+    app = create_app()
+    app.config['TESTING'] = True
+    mongo.cx = mongomock.MongoClient()
+    mongo.db = mongo.cx.book_library_test
+    # mongomock has no projection expressions; BookSummary trims the description itself
+    monkeypatch.setattr(Book, 'SUMMARY_PROJECTION', dict(Book.SUMMARY_PROJECTION, description=1))
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def client(app, monkeypatch):
+    # No heartbeat thread, rate limits or pages left over from other tests
+    monkeypatch.setattr(health, '_start', lambda app: None)
+    app.config['RATE_LIMIT_ENABLED'] = False
+    http_cache._page_cache.clear()
+    return app.test_client()
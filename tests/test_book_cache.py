@@ -0,0 +1,54 @@
+from bson import ObjectId
+
+from app import mongo
+from app.models.book import Book
+from app.models.favorite import Favorite
+
+
+def _book(title='Dune'):
+    data = {'title': title, 'author': 'Frank Herbert', 'genre': 'Science Fiction', 'year': 1965,
+            'description': 'Spice.', 'image': None, 'image_digest': None}
+    return Book.create(data).inserted_id
+
+
+def test_update_and_delete_evict_the_cached_book(app):
+    book_id = _book()
+    assert Book.get_by_id(book_id)['title'] == 'Dune'
+    assert [book.title for book in Book.get_many([book_id])] == ['Dune']
+
+    Book.update(str(book_id), {'title': 'Dune Messiah'})
+    assert Book.get_by_id(book_id)['title'] == 'Dune Messiah'
+    assert [book.title for book in Book.get_many([book_id])] == ['Dune Messiah']
+
+    Book.delete(str(book_id))
+    assert Book.get_by_id(book_id) is None
+    assert Book.get_many([book_id]) == []
+
+
+def test_favorite_changes_evict_the_cached_book(app):
+    book_id = _book()
+    user_id = ObjectId()
+    version = Book.get_version(book_id)[0]
+    Book.get_many([book_id])
+
+    Favorite.add(user_id, book_id)
+    assert Book.get_by_id(book_id)['favorite_count'] == 1
+    assert Book.get_many([book_id])[0].favorite_count == 1
+    assert Book.get_version(book_id)[0] == version + 1
+
+    Favorite.remove(user_id, book_id)
+    assert Book.get_by_id(book_id)['favorite_count'] == 0
+
+
+def test_writes_from_another_worker_show_up_after_the_verify_interval(app):
+    app.config['BOOK_CACHE_VERIFY_INTERVAL'] = 60
+    book_id = _book()
+    Book.get_by_id(book_id)
+
+    # What Book.update does in another worker, without this worker's eviction
+    mongo.db.books.update_one({'_id': book_id}, {'$set': {'title': 'Dune Messiah'}, '$inc': {'version': 1}})
+    mongo.db.counters.update_one({'_id': 'books'}, {'$inc': {'version': 1}})
+    assert Book.get_by_id(book_id)['title'] == 'Dune'
+
+    app.config['BOOK_CACHE_VERIFY_INTERVAL'] = 0
+    assert Book.get_by_id(book_id)['title'] == 'Dune Messiah'
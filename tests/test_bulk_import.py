@@ -0,0 +1,44 @@
+import pytest
+from pymongo import InsertOne
+
+from app import mongo
+from app.models.book import Book
+
+
+def test_upsert_on_id_inserts_rows_without_id(app, monkeypatch):
+    # mongomock gives an upserted {'_id': None} a fresh id; MongoDB stores it as null
+    sent = []
+    bulk_write = type(mongo.db.books).bulk_write
+    monkeypatch.setattr(type(mongo.db.books), 'bulk_write',
+                        lambda self, ops, **kwargs: sent.extend(ops) or bulk_write(self, ops, **kwargs))
+    docs = [Book.from_import({'title': 'First', 'author': 'A'}),
+            Book.from_import({'title': 'Second', 'author': 'B'})]
+
+    written, errors = Book.bulk_import(docs, upsert_on=['_id'])
+
+    assert (written, errors) == (2, [])
+    assert all(isinstance(op, InsertOne) for op in sent)
+    books = list(mongo.db.books.find({}, {'title': 1}))
+    assert sorted(book['title'] for book in books) == ['First', 'Second']
+    assert len({book['_id'] for book in books}) == 2
+
+
+def test_upsert_on_id_updates_exported_rows(app):
+    Book.bulk_import([Book.from_import({'title': 'Old', 'author': 'A'})])
+    book_id = mongo.db.books.find_one()['_id']
+
+    written, errors = Book.bulk_import(
+        [Book.from_import({'id': str(book_id), 'title': 'New', 'author': 'A'})], upsert_on=['_id']
+    )
+
+    assert (written, errors) == (1, [])
+    assert mongo.db.books.count_documents({}) == 1
+    assert mongo.db.books.find_one({'_id': book_id})['title'] == 'New'
+
+
+def test_text_fields_are_stored_as_strings(app):
+    doc = Book.from_import({'title': 1984, 'author': 'George Orwell', 'genre': 7, 'description': 3.5, 'year': '1949'})
+
+    assert (doc['title'], doc['genre'], doc['description'], doc['year']) == ('1984', '7', '3.5', 1949)
+    with pytest.raises(ValueError):
+        Book.from_import({'title': ['Dune'], 'author': 'Frank Herbert'})
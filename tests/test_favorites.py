@@ -0,0 +1,28 @@
+from bson import ObjectId
+
+from app import mongo
+from app.models.book import Book
+from app.models.favorite import Favorite
+
+
+def test_migrate_embedded_keeps_array_order(app):
+    book_ids = [ObjectId() for _ in range(5)]
+    user_id = mongo.db.users.insert_one({'username': 'reader', 'favorites': [str(b) for b in book_ids]}).inserted_id
+
+    assert Favorite.migrate_embedded() == (1, 5)
+
+    # Newest first: the reverse of the order the books were added in
+    assert Favorite.book_ids(user_id) == [str(b) for b in reversed(book_ids)]
+    assert 'favorites' not in mongo.db.users.find_one({'_id': user_id})
+
+
+def test_recount_bumps_versions_and_clears_the_book_cache(app):
+    book_id = mongo.db.books.insert_one({'title': 'Dune', 'favorite_count': 5, 'version': 1}).inserted_id
+    mongo.db.favorites.insert_one({'user_id': ObjectId(), 'book_id': book_id})
+    assert Book.get_by_id(book_id)['favorite_count'] == 5
+
+    Favorite.recount()
+
+    book = Book.get_by_id(book_id)
+    assert book['favorite_count'] == 1
+    assert book['version'] == 3
@@ -0,0 +1,85 @@
+from flask import g
+
+from app import http_cache, mongo
+from app.models.book import Book
+
+
+def _book(title='Dune'):
+    data = {'title': title, 'author': 'Frank Herbert', 'genre': 'Science Fiction', 'year': 1965,
+            'description': 'Spice.', 'image': None, 'image_digest': None}
+    return str(Book.create(data).inserted_id)
+
+
+def _log_in(client):
+    user_id = mongo.db.users.insert_one({'username': 'reader', 'email': 'reader@example.com',
+                                         'password_hash': 'x', 'role': 'client'}).inserted_id
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    # Requests share the fixture's app context, where Flask-Login kept the anonymous user
+    g.pop('_login_user', None)
+
+
+def test_matching_etag_gets_304(client):
+    url = f'/books/{_book()}'
+    first = client.get(url)
+
+    again = client.get(url, headers={'If-None-Match': first.headers['ETag']})
+
+    assert first.status_code == 200
+    assert again.status_code == 304
+    assert again.headers['ETag'] == first.headers['ETag']
+
+
+def test_update_changes_the_etag_and_the_cached_page(client):
+    book_id = _book()
+    url = f'/books/{book_id}'
+    first = client.get(url)
+
+    Book.update(book_id, {'title': 'Dune Messiah'})
+    after = client.get(url, headers={'If-None-Match': first.headers['ETag']})
+
+    assert after.status_code == 200
+    assert after.headers['ETag'] != first.headers['ETag']
+    assert b'Dune Messiah' in after.data
+
+
+def test_logged_in_users_skip_the_anonymous_page_and_etag(client):
+    url = f'/books/{_book()}'
+    anonymous = client.get(url)
+    cached = len(http_cache._page_cache)
+    _log_in(client)
+
+    response = client.get(url, headers={'If-None-Match': anonymous.headers['ETag'],
+                                        'If-Modified-Since': anonymous.headers['Last-Modified']})
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] != anonymous.headers['ETag']
+    assert 'private' in response.headers['Cache-Control']
+    assert len(http_cache._page_cache) == cached
+
+
+def test_pending_flashes_bypass_the_cache(client):
+    url = f'/books/{_book()}'
+    first = client.get(url)
+    with client.session_transaction() as session:
+        session['_flashes'] = [('success', 'Book updated successfully')]
+
+    response = client.get(url, headers={'If-None-Match': first.headers['ETag']})
+
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
+    assert b'Book updated successfully' in response.data
+    assert client.get(url).data != response.data
+
+
+def test_popular_and_trending_sorts_bypass_the_cache(client):
+    _book()
+    for sort in ('popular', 'trending'):
+        url = f'/books?sort={sort}'
+        first = client.get(url)
+
+        assert first.status_code == 200
+        assert 'ETag' not in first.headers
+        assert http_cache._page_cache.get(url) is None
+    assert 'ETag' in client.get('/books').headers
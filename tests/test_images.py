@@ -0,0 +1,29 @@
+import os
+
+from PIL import Image
+
+from app.images import generate_variants
+
+
+def test_legacy_covers_sharing_a_stem_keep_separate_variants(tmp_path):
+    Image.new('RGB', (40, 20), 'red').save(tmp_path / 'cover.jpg')
+    Image.new('RGB', (20, 40), 'blue').save(tmp_path / 'cover.png')
+
+    jpg = generate_variants(str(tmp_path), 'cover.jpg')
+    png = generate_variants(str(tmp_path), 'cover.png')
+
+    assert jpg['thumb']['jpeg'] != png['thumb']['jpeg']
+    with Image.open(os.path.join(tmp_path, jpg['thumb']['jpeg'])) as image:
+        assert image.size == (40, 20)
+    with Image.open(os.path.join(tmp_path, png['thumb']['jpeg'])) as image:
+        assert image.size == (20, 40)
+
+
+def test_content_addressed_variants_are_named_by_digest(tmp_path):
+    digest = 'ab' * 32
+    os.makedirs(tmp_path / 'cas' / 'ab')
+    Image.new('RGB', (40, 20), 'red').save(tmp_path / 'cas' / 'ab' / f'{digest}.png')
+
+    variants = generate_variants(str(tmp_path), f'cas/ab/{digest}.png')
+
+    assert variants['thumb']['webp'] == f'variants/{digest}-thumb.webp'
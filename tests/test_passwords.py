@@ -0,0 +1,11 @@
+import pytest
+
+from app.passwords import PasswordHasherBusy, hash_password
+
+
+def test_slow_hash_raises_busy(app):
+    app.config.update(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_TIMEOUT=0.001,
+                      PASSWORD_HASH_METHOD='pbkdf2:sha256:2000000')
+
+    with pytest.raises(PasswordHasherBusy):
+        hash_password('secret')
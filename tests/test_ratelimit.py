@@ -0,0 +1,66 @@
+import threading
+
+import pytest
+
+from app import ratelimit
+from app.models.book import Book
+
+
+def _limit(monkeypatch, app, rate_limits='', concurrency_limits=''):
+    app.config['RATE_LIMIT_ENABLED'] = True
+    rate_rules = ratelimit.parse_rules(rate_limits, ratelimit.parse_rate)
+    concurrency_rules = ratelimit.parse_rules(concurrency_limits, int)
+    monkeypatch.setitem(ratelimit._state, 'rate_rules', rate_rules)
+    monkeypatch.setitem(ratelimit._state, 'concurrency_rules', concurrency_rules)
+    monkeypatch.setitem(ratelimit._state, 'slots', {rule.key: threading.BoundedSemaphore(rule.value)
+                                                   for rule in concurrency_rules})
+    monkeypatch.setitem(ratelimit._state, 'backend', ratelimit.MemoryBackend(100))
+
+
+def test_429_with_retry_after_once_the_burst_is_used(app, client, monkeypatch):
+    _limit(monkeypatch, app, rate_limits='books.suggest=3/60')
+
+    statuses = [client.get('/search/suggest?q=du').status_code for _ in range(4)]
+    throttled = client.get('/search/suggest?q=du')
+
+    assert statuses == [200, 200, 200, 429]
+    assert throttled.status_code == 429
+    # One token per 20 seconds
+    assert throttled.headers['Retry-After'] == '20'
+    assert client.get('/books').status_code == 200
+
+
+def test_memory_bucket_refills_over_time(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, 'monotonic', lambda: now[0])
+    backend = ratelimit.MemoryBackend(100)
+
+    assert [backend.hit('key', 2, 10)[0] for _ in range(3)] == [True, True, False]
+    now[0] += 5
+    assert backend.hit('key', 2, 10) == (True, 0)
+    assert backend.hit('key', 2, 10) == (False, 5)
+
+
+def test_mongo_bucket_is_shared_between_workers(app):
+    backend = ratelimit.MongoBackend()
+
+    assert [backend.hit('key', 2, 60)[0] for _ in range(2)] == [True, True]
+    assert backend.hit('key', 2, 60) == (False, 30)
+    # mongomock has no $$NOW, so refills are only covered for the memory backend
+    assert ratelimit.MongoBackend().hit('key', 2, 60)[0] is False
+
+
+def test_concurrency_slot_is_released_when_the_view_raises(app, client, monkeypatch):
+    _limit(monkeypatch, app, concurrency_limits='books.book_detail=1')
+
+    def fail(book_id):
+        raise RuntimeError('database down')
+
+    monkeypatch.setattr(Book, 'get_version', staticmethod(fail))
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            client.get('/books/000000000000000000000000')
+
+    slot = ratelimit._state['slots']['books.book_detail']
+    assert slot.acquire(blocking=False)
+    slot.release()
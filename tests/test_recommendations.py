@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta
+
+from app import mongo
+from app.models.favorite import Favorite
+from app.models.recommendation import Recommendation
+
+
+def _setup(app):
+    app.config['RECOMMENDATION_BASKET_LIMIT'] = 3
+    book_ids = mongo.db.books.insert_many([{'title': f'Book {i}', 'favorite_count': 0}
+                                           for i in range(6)]).inserted_ids
+    user_ids = mongo.db.users.insert_many([{'username': f'reader{i}'} for i in range(3)]).inserted_ids
+    config = {key: app.config[key] for key in ('RECOMMENDATION_BASKET_LIMIT', 'RECOMMENDATION_TOP_K')}
+    return book_ids, user_ids, config
+
+
+def _pairs():
+    return {(pair['a'], pair['b']): pair['count'] for pair in mongo.db.book_pairs.find() if pair['count'] > 0}
+
+
+def _lists():
+    return {doc['_id']: [(entry['book_id'], entry['score']) for entry in doc['similar']]
+            for doc in mongo.db.recommendations.find() if doc['similar']}
+
+
+def test_incremental_updates_match_a_rebuild(app):
+    book_ids, user_ids, config = _setup(app)
+    steps = [(0, 0, True), (0, 1, True), (0, 2, True), (0, 3, True), (0, 4, True),
+             (1, 0, True), (1, 1, True), (1, 3, True), (2, 2, True), (2, 3, True),
+             (0, 4, False), (0, 1, False), (1, 5, True), (1, 5, False), (0, 0, False), (0, 3, False)]
+    clock = datetime(2026, 1, 1)
+    for user, book, add in steps:
+        user_id, book_id = user_ids[user], book_ids[book]
+        if add:
+            assert Favorite.add(user_id, book_id)
+            # Distinct timestamps, so both paths agree on the basket order
+            clock += timedelta(seconds=1)
+            mongo.db.favorites.update_one({'user_id': user_id, 'book_id': book_id},
+                                          {'$set': {'created_at': clock}})
+            Recommendation.favorite_changed(user_id, book_id, 1, config)
+        else:
+            added_at = Favorite.remove(user_id, book_id)
+            assert added_at
+            Recommendation.favorite_changed(user_id, book_id, -1, config, added_at)
+    incremental_pairs = _pairs()
+    # Lists of untouched books keep their old scores until refreshed
+    Recommendation.refresh(book_ids, config['RECOMMENDATION_TOP_K'])
+    incremental_lists = _lists()
+
+    Recommendation.rebuild()
+
+    assert _pairs() == incremental_pairs
+    assert _lists() == incremental_lists
+
+
+def test_rebuild_keeps_pairs_updated_while_it_runs(app):
+    book_ids, user_ids, config = _setup(app)
+    a, b, c = book_ids[:3]
+    Favorite.add(user_ids[0], a)
+    Favorite.add(user_ids[0], b)
+    # Written by an incremental update after the rebuild read its snapshot
+    later = (datetime.utcnow() + timedelta(minutes=5)).replace(microsecond=0)
+    mongo.db.book_pairs.insert_many([{'a': a, 'b': c, 'count': 1, 'updated_at': later},
+                                     {'a': c, 'b': a, 'count': 1, 'updated_at': later}])
+    mongo.db.recommendations.insert_one({'_id': c, 'similar': [], 'updated_at': later})
+
+    Recommendation.rebuild()
+
+    assert _pairs() == {(a, b): 1, (b, a): 1, (a, c): 1, (c, a): 1}
+    assert mongo.db.recommendations.find_one({'_id': c})['updated_at'] == later
+
+
+def test_deleting_a_book_refreshes_the_lists_that_showed_it(app):
+    book_ids, user_ids, config = _setup(app)
+    a, b, c = book_ids[:3]
+    for book_id in (a, b, c):
+        Favorite.add(user_ids[0], book_id)
+    Recommendation.rebuild()
+    stamp = Recommendation.stamp(a)
+
+    Recommendation.remove_book(b)
+
+    assert Recommendation.similar_ids(a) == [str(c)]
+    assert Recommendation.stamp(a) != stamp
+    assert mongo.db.book_pairs.count_documents({'$or': [{'a': b}, {'b': b}]}) == 0
+
+
+def test_renaming_a_book_changes_the_stamp_of_lists_showing_it(app):
+    book_ids, user_ids, config = _setup(app)
+    a, b, c = book_ids[:3]
+    Favorite.add(user_ids[0], a)
+    Favorite.add(user_ids[0], b)
+    Recommendation.rebuild()
+    stamps = {book_id: Recommendation.stamp(book_id) for book_id in (a, c)}
+
+    Recommendation.book_changed(b)
+
+    assert Recommendation.stamp(a) != stamps[a]
+    assert Recommendation.stamp(c) == stamps[c]
+
+
+def test_removing_a_reader_matches_a_rebuild(app):
+    book_ids, user_ids, config = _setup(app)
+    clock = datetime(2026, 1, 1)
+    for user, books in ((0, (0, 1, 2)), (1, (0, 1, 2, 3, 4))):
+        for book in books:
+            Favorite.add(user_ids[user], book_ids[book])
+            clock += timedelta(seconds=1)
+            mongo.db.favorites.update_one({'user_id': user_ids[user], 'book_id': book_ids[book]},
+                                          {'$set': {'created_at': clock}})
+    Recommendation.rebuild()
+
+    Recommendation.reader_removed(Favorite.remove_for_user(user_ids[1]), config)
+    pairs = _pairs()
+    Recommendation.refresh(book_ids, config['RECOMMENDATION_TOP_K'])
+    lists = _lists()
+    Recommendation.rebuild()
+
+    assert pairs == _pairs()
+    assert lists == _lists()
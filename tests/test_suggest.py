@@ -0,0 +1,32 @@
+import threading
+
+from app import mongo
+from app.models.book import Book
+from app.routes import books as books_routes
+from app.suggest import SuggestIndex
+
+
+def test_cold_index_builds_once_in_background(client, monkeypatch):
+    index = SuggestIndex()
+    monkeypatch.setattr(books_routes, 'suggest_index', index)
+    mongo.db.books.insert_one({'title': 'Dune', 'author': 'Frank Herbert'})
+    release, loads = threading.Event(), []
+
+    def load_suggest_entries():
+        loads.append(1)
+        release.wait(5)
+        return list(mongo.db.books.find({}, {'title': 1, 'author': 1}))
+
+    monkeypatch.setattr(Book, 'load_suggest_entries', staticmethod(load_suggest_entries))
+
+    cold = [client.get('/search/suggest?q=du').get_json() for _ in range(3)]
+    release.set()
+    for _ in range(500):
+        if index.ready:
+            break
+        threading.Event().wait(0.01)
+    warm = client.get('/search/suggest?q=du').get_json()
+
+    assert [response['suggestions'] for response in cold] == [[], [], []]
+    assert len(loads) == 1
+    assert [item['label'] for item in warm['suggestions']] == ['Dune']
@@ -0,0 +1,50 @@
+import io
+import os
+
+import pytest
+
+from app import mongo
+from app.models.book import Book
+from app.models.upload import Upload
+
+
+def _form(cover=b'cover bytes'):
+    return {'title': 'Dune', 'author': 'Frank Herbert', 'genre': 'Science Fiction', 'year': '1965',
+            'description': 'Spice.', 'image': (io.BytesIO(cover), 'cover.png')}
+
+
+@pytest.fixture
+def uploads(app, tmp_path, monkeypatch):
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    # Variants need a real image; these tests only follow the stored file
+    monkeypatch.setattr('app.routes.books.process_cover_async', lambda book_id, filename: None)
+    return tmp_path
+
+
+def test_saved_book_holds_the_only_reference(client, uploads):
+    client.post('/books/add', data=_form(), content_type='multipart/form-data')
+
+    book = mongo.db.books.find_one()
+    assert mongo.db.uploads.find_one({'_id': book['image_digest']})['refs'] == 1
+    assert os.path.exists(os.path.join(uploads, book['image']))
+
+
+def test_failed_save_releases_the_upload(client, uploads, monkeypatch):
+    def fail(data):
+        raise RuntimeError('database down')
+
+    monkeypatch.setattr(Book, 'create', staticmethod(fail))
+    with pytest.raises(RuntimeError):
+        client.post('/books/add', data=_form(), content_type='multipart/form-data')
+
+    assert mongo.db.uploads.count_documents({}) == 0
+    assert not [name for _, _, names in os.walk(uploads) for name in names]
+
+
+def test_release_keeps_files_that_are_still_referenced(app):
+    Upload.acquire('digest', 'cas/di/digest.png')
+    Upload.acquire('digest', 'cas/di/digest.png')
+
+    assert Upload.release('digest') is None
+    assert Upload.release('digest') == 'cas/di/digest.png'
+    assert Upload.get('digest') is None
@@ -0,0 +1,32 @@
+from app import mongo
+from app.models.user import User
+
+
+def _seed():
+    names = ['carol', 'alice', 'bob', 'alan', 'albert', 'alma']
+    mongo.db.users.insert_many([{'username': name, 'email': f'{name}@example.com', 'role': 'client'}
+                                for name in names])
+
+
+def test_prefix_search_pages_in_username_order(app):
+    _seed()
+    filters = User.build_filters(search='al')
+
+    first = User.paginate(filters, per_page=2, order_by=User.search_field('al'))
+    second = User.paginate(filters, after=first['next_cursor'], per_page=2, order_by='username')
+    back = User.paginate(filters, before=second['prev_cursor'], per_page=2, order_by='username')
+
+    assert [user.username for user in first['items']] == ['alan', 'albert']
+    assert [user.username for user in second['items']] == ['alice', 'alma']
+    assert second['next_cursor'] is None
+    assert [user.username for user in back['items']] == ['alan', 'albert']
+    assert back['prev_cursor'] is None
+
+
+def test_search_with_at_sign_matches_email(app):
+    _seed()
+
+    assert User.search_field('bob@') == 'email'
+    page = User.paginate(User.build_filters(search='bob@'), order_by=User.search_field('bob@'))
+
+    assert [user.username for user in page['items']] == ['bob']
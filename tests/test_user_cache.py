@@ -0,0 +1,48 @@
+from app import mongo
+from app.models.recommendation import Recommendation
+from app.models.user import User
+
+
+def _user():
+    return mongo.db.users.insert_one({'username': 'reader', 'email': 'reader@example.com',
+                                      'password_hash': 'x', 'role': 'client', 'version': 1}).inserted_id
+
+
+def test_own_writes_evict_the_cached_user(app):
+    user_id = _user()
+    assert User.get_cached(user_id).role == 'client'
+
+    User.update_role(str(user_id), 'admin')
+    assert User.get_cached(user_id).role == 'admin'
+
+    User.delete(str(user_id))
+    assert User.get_cached(user_id) is None
+
+
+def test_favorite_changes_bump_the_cached_version(app, monkeypatch):
+    monkeypatch.setattr(Recommendation, 'favorite_changed_async', staticmethod(lambda *args: None))
+    user_id = _user()
+    book_id = mongo.db.books.insert_one({'title': 'Dune', 'favorite_count': 0}).inserted_id
+    user = User.get_cached(user_id)
+
+    user.add_favorite(book_id)
+    added = User.get_cached(user_id)
+    user.remove_favorite(book_id)
+
+    assert added.version == user.version + 1
+    assert User.get_cached(user_id).version == user.version + 2
+
+
+def test_writes_from_another_worker_show_up_after_the_verify_interval(app):
+    app.config['USER_CACHE_VERIFY_INTERVAL'] = 60
+    user_id = _user()
+    User.get_cached(user_id)
+
+    # A role change made by another worker
+    mongo.db.users.update_one({'_id': user_id}, {'$set': {'role': 'admin'}, '$inc': {'version': 1}})
+    assert User.get_cached(user_id).role == 'client'
+
+    app.config['USER_CACHE_VERIFY_INTERVAL'] = 0
+    assert User.get_cached(user_id).role == 'admin'
+    mongo.db.users.delete_one({'_id': user_id})
+    assert User.get_cached(user_id) is None
@@ -0,0 +1,38 @@
+from app import mongo
+from app.models.book import Book
+from app.models.views import BookViews
+
+
+def test_counted_views_are_flushed_into_the_trending_order(client):
+    quiet, popular = mongo.db.books.insert_many([{'title': 'Quiet'}, {'title': 'Popular'}]).inserted_ids
+    BookViews.flush()
+    for book_id, views in ((quiet, 1), (popular, 3)):
+        for _ in range(views):
+            assert client.get(f'/books/{book_id}').status_code == 200
+    assert client.get('/books/000000000000000000000000').status_code == 302
+    assert BookViews.pending() == 4
+
+    assert BookViews.flush() == 2
+
+    books = {book['_id']: book for book in mongo.db.books.find()}
+    assert books[quiet]['views'] == 1
+    assert books[popular]['views'] == 3
+    assert books[popular]['trending'] > books[quiet]['trending']
+    assert BookViews.pending() == 0
+    assert [book.title for book in Book.trending_page()['items']] == ['Popular', 'Quiet']
+
+
+def test_later_flushes_add_to_the_stored_counts(client):
+    book_id = mongo.db.books.insert_one({'title': 'Dune'}).inserted_id
+    BookViews.flush()
+    client.get(f'/books/{book_id}')
+    BookViews.flush()
+    first = mongo.db.books.find_one({'_id': book_id})
+
+    client.get(f'/books/{book_id}')
+    client.get(f'/books/{book_id}')
+    BookViews.flush()
+    second = mongo.db.books.find_one({'_id': book_id})
+
+    assert (first['views'], second['views']) == (1, 3)
+    assert second['trending'] > first['trending']